@@ -33,6 +33,11 @@ ALLOWED_HOSTS = ['.wellmay.uz', 'wellmay.uz', 'www.wellmay.uz', 'localhost', '12
 TELEGRAM_BOT_TOKEN = config("TELEGRAM_BOT_TOKEN")
 TELEGRAM_USER_ID1 = config("TELEGRAM_USER_ID1")
 TELEGRAM_USER_ID2 = config("TELEGRAM_USER_ID2")
+# users/telegram.py: Bot API manzili (testlarda stub server), timeoutlar va ulanishlar puli
+TELEGRAM_API_URL = config("TELEGRAM_API_URL", default="https://api.telegram.org")
+TELEGRAM_CONNECT_TIMEOUT = config("TELEGRAM_CONNECT_TIMEOUT", cast=float, default=3.05)
+TELEGRAM_READ_TIMEOUT = config("TELEGRAM_READ_TIMEOUT", cast=float, default=10.0)
+TELEGRAM_POOL_SIZE = config("TELEGRAM_POOL_SIZE", cast=int, default=10)
 
 
 ####### Email kod jo'natish sozlamalari#######################
@@ -43,6 +48,37 @@ EMAIL_USE_TLS = config("EMAIL_USE_TLS", cast=bool, default=True)
 EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# OTP xabarlari navbati (users/outbox.py, deliver_outbox buyrug'i)
+OUTBOX_SEND_TIMEOUT = config("OUTBOX_SEND_TIMEOUT", cast=float, default=10.0)
+OUTBOX_CONCURRENCY = config("OUTBOX_CONCURRENCY", cast=int, default=8)
+OUTBOX_MAX_ATTEMPTS = config("OUTBOX_MAX_ATTEMPTS", cast=int, default=6)
+OUTBOX_BACKOFF_SECONDS = config("OUTBOX_BACKOFF_SECONDS", cast=float, default=5.0)
+OUTBOX_BACKOFF_MAX_SECONDS = config("OUTBOX_BACKOFF_MAX_SECONDS", cast=float, default=600.0)
+OUTBOX_TRANSPORTS = {
+    "email": "users.outbox.EmailTransport",
+    "telegram": "users.outbox.TelegramTransport",
+}
+####################################################
+
+
+####### Yaqin atrofdagilarni qidirish (xotiradagi indeks) #######
+PROFILE_INDEX_ENABLED = config("PROFILE_INDEX_ENABLED", cast=bool, default=True)
+PROFILE_INDEX_REFRESH_SECONDS = config("PROFILE_INDEX_REFRESH_SECONDS", cast=int, default=5)
+PROFILE_INDEX_REBUILD_SECONDS = config("PROFILE_INDEX_REBUILD_SECONDS", cast=int, default=600)
+####################################################
+
+
+####### Kesh (rate limit, block ro'yxatlari va h.k.) #######
+# Lokal test uchun: locmem (standart) yoki file; prod uchun redis/memcached backend berish mumkin
+CACHE_BACKEND = config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache")
+CACHE_LOCATION = config("CACHE_LOCATION", default="anketalar")
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    }
+}
 ####################################################
 
 
@@ -92,7 +128,14 @@ CORS_ALLOW_ALL_ORIGINS = True  # Barcha domenlardan keluvchi so'rovlarni qabul q
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # users/throttling.py dagi token-bucket throttlelar uchun ("son/davr")
+    'DEFAULT_THROTTLE_RATES': {
+        'match': config("THROTTLE_MATCH_RATE", default="60/min"),
+        'send_request': config("THROTTLE_SEND_REQUEST_RATE", default="30/min"),
+        'otp': config("THROTTLE_OTP_RATE", default="3/hour"),
+        'otp_ip': config("THROTTLE_OTP_IP_RATE", default="20/hour"),
+    },
 }
 ROOT_URLCONF = 'anketalar.urls'
 
@@ -119,6 +162,10 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
 }
+# Login dagi JWT ga profil xulosasini qo'shish (users/authentication.py, ProfileClaimsAuthentication)
+JWT_PROFILE_CLAIMS_ENABLED = config("JWT_PROFILE_CLAIMS_ENABLED", cast=bool, default=False)
+# Joriy xulosa versiyasi keshda qancha turadi (LocMem da boshqa workerlar shu muddatgacha eski versiyani ko'radi)
+JWT_PROFILE_CLAIMS_VERSION_CACHE_SECONDS = config("JWT_PROFILE_CLAIMS_VERSION_CACHE_SECONDS", cast=int, default=60)
 
 
 WSGI_APPLICATION = 'anketalar.wsgi.application'
@@ -159,6 +206,33 @@ AUTH_PASSWORD_VALIDATORS = [
 
 AUTH_USER_MODEL = config('AUTH_USER_MODEL')
 
+####### Parol hashlash (users/hashers.py, users/passwords.py) #######
+# PASSWORD_HASHER: pbkdf2 (standart) | argon2 (argon2-cffi kerak) | bcrypt (bcrypt kerak)
+PASSWORD_HASHER = config("PASSWORD_HASHER", default="pbkdf2")
+_PASSWORD_HASHER_CLASSES = {
+    "pbkdf2": "users.hashers.TunedPBKDF2PasswordHasher",
+    "argon2": "users.hashers.TunedArgon2PasswordHasher",
+    "bcrypt": "users.hashers.TunedBCryptSHA256PasswordHasher",
+}
+# Birinchisi yangi hashlar uchun, qolganlari mavjud (PBKDF2) hashlarni tekshirish uchun
+PASSWORD_HASHERS = [_PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for path in (
+        "users.hashers.TunedPBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    ) if path != _PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]
+]
+PASSWORD_PBKDF2_ITERATIONS = config("PASSWORD_PBKDF2_ITERATIONS", cast=int, default=1_000_000)
+PASSWORD_ARGON2_TIME_COST = config("PASSWORD_ARGON2_TIME_COST", cast=int, default=2)
+PASSWORD_ARGON2_MEMORY_COST = config("PASSWORD_ARGON2_MEMORY_COST", cast=int, default=102400)  # KiB
+PASSWORD_ARGON2_PARALLELISM = config("PASSWORD_ARGON2_PARALLELISM", cast=int, default=8)
+PASSWORD_BCRYPT_ROUNDS = config("PASSWORD_BCRYPT_ROUNDS", cast=int, default=12)
+# Hashlash pooli (har bir worker jarayonida): 0 — yadrolar soni; navbat to'lsa
+# PASSWORD_HASH_WAIT_SECONDS kutiladi, keyin 503
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", cast=int, default=0)
+PASSWORD_HASH_QUEUE_SIZE = config("PASSWORD_HASH_QUEUE_SIZE", cast=int, default=16)
+PASSWORD_HASH_WAIT_SECONDS = config("PASSWORD_HASH_WAIT_SECONDS", cast=float, default=2.0)
+####################################################
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
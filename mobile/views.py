@@ -9,11 +9,16 @@ from django.conf import settings
 import requests
 from users.models import CustomUser, PendingUser, UserProfile, Purpose, Interest, UserImage, Region, District
 from django.db import transaction
-from django.contrib.auth.hashers import make_password
-from users.functions import send_email_code, send_telegram_code
+from asgiref.sync import sync_to_async
+from users.async_views import AsyncAPIView
+from users.passwords import ahash_password
+from users.outbox import enqueue_email_code, enqueue_telegram_code
+from users.throttling import OTPIPRateThrottle, OTPRateThrottle
 from django.db.models import Q
 
 class VerifyStartAPIView(APIView):
+    throttle_classes = [OTPRateThrottle, OTPIPRateThrottle]
+
     def post(self, request):
         data = request.data
         email_or_phone = data.get("email_or_phone")
@@ -31,7 +36,7 @@ class VerifyStartAPIView(APIView):
                 email=email_or_phone,
                 defaults={"code": code, "code_expires": expires}
             )
-            send_email_code(email_or_phone, code)
+            enqueue_email_code(email_or_phone, code)
             destination = "email"
 
         else:  # telefon
@@ -40,7 +45,7 @@ class VerifyStartAPIView(APIView):
                 defaults={"code": code, "code_expires": expires}
             )
             message = f"Tasdiqlash kodi: {code}"
-            send_telegram_code(message, chat_ids=[settings.TELEGRAM_USER_ID1, settings.TELEGRAM_USER_ID2])
+            enqueue_telegram_code(message, chat_ids=[settings.TELEGRAM_USER_ID1, settings.TELEGRAM_USER_ID2])
             destination = "telefon (Telegram bot)"
 
         return Response({"message": f"Tasdiqlash kodi {destination} orqali yuborildi."})
@@ -84,8 +89,10 @@ class VerifyCheckAPIView(APIView):
         return Response({"message": "Foydalanuvchi muvaffaqiyatli tasdiqlandi.",
                          "temp_token": pending.id})  # keyingi register bosqichi uchun token
     
-class RegisterAPIView(APIView):
-    def post(self, request):
+class RegisterAPIView(AsyncAPIView):
+    """Parol password_pool da hashlanadi, yozish esa bitta tranzaksiyada (create_user)"""
+
+    async def post(self, request):
         data = request.data
 
         temp_token = data.get("temp_token")
@@ -93,15 +100,6 @@ class RegisterAPIView(APIView):
         password = data.get("password")
         birth_year = data.get("birth_year")
         gender = data.get("gender")
-        bio = data.get("bio")
-        weight = data.get("weight")
-        height = data.get("height")
-        region_id = data.get("region_id")
-        district_id = data.get("district_id")
-        purposes_ids = data.get("purposes", "")
-        interests_ids = data.get("interests", "")
-        latitude = data.get("latitude")
-        longitude = data.get("longitude")
 
         # Rasmlar
         main_image = request.FILES.get("images_main")
@@ -117,13 +115,34 @@ class RegisterAPIView(APIView):
 
         # PendingUser tekshirish
         try:
-            pending_user = PendingUser.objects.get(id=temp_token, is_verified=True)
+            pending_user = await PendingUser.objects.aget(id=temp_token, is_verified=True)
         except PendingUser.DoesNotExist:
             return Response({"error": "Tasdiqlangan foydalanuvchi topilmadi."}, status=status.HTTP_400_BAD_REQUEST)
 
         if len(other_images) > 5:
             return Response({"error": "5 tadan ortiq rasm yuklab bo‘lmaydi."}, status=status.HTTP_400_BAD_REQUEST)
 
+        # Hashlash tranzaksiyadan oldin — qatorlar qulflanmagan paytda
+        password_hash = await ahash_password(password)
+
+        return await sync_to_async(self.create_user)(
+            pending_user, password_hash, data, main_image, auth_image, other_images,
+        )
+
+    def create_user(self, pending_user, password_hash, data, main_image, auth_image, other_images):
+        name = data.get("name")
+        birth_year = data.get("birth_year")
+        gender = data.get("gender")
+        bio = data.get("bio")
+        weight = data.get("weight")
+        height = data.get("height")
+        region_id = data.get("region_id")
+        district_id = data.get("district_id")
+        purposes_ids = data.get("purposes", "")
+        interests_ids = data.get("interests", "")
+        latitude = data.get("latitude")
+        longitude = data.get("longitude")
+
         try:
             with transaction.atomic():
                 # CustomUser yaratish
@@ -133,7 +152,7 @@ class RegisterAPIView(APIView):
                     email=email,
                     phone=phone,
                     name=name,
-                    password=make_password(password)
+                    password=password_hash
                 )
                 # Region va District
                 region = Region.objects.filter(id=region_id).first() if region_id else None
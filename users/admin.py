@@ -10,7 +10,10 @@ from .models import (
     UserProfileExtension,
     Region,
     District,
-    PendingUser
+    PendingUser,
+    MatchQueue,
+    Connection,
+    OutboxMessage,
 )
 
 
@@ -59,7 +62,7 @@ class UserProfileExtensionAdmin(admin.ModelAdmin):
     list_display = ('user_email', 'requests_left', 'daily_requests_limit', 'last_reset')
     list_filter = ('last_reset',)
     search_fields = ('user_profile__user__email', 'user_profile__user__phone')
-    filter_horizontal = ('subscribers', 'requests', 'blocked_users')
+    filter_horizontal = ('blocked_users',)
     readonly_fields = ('last_reset',)
 
     def user_email(self, obj):
@@ -67,6 +70,37 @@ class UserProfileExtensionAdmin(admin.ModelAdmin):
     user_email.short_description = "User Email"
 
 
+# --- CONNECTION ---
+@admin.register(Connection)
+class ConnectionAdmin(admin.ModelAdmin):
+    list_display = ('from_profile', 'to_profile', 'status', 'created_at', 'updated_at')
+    list_filter = ('status',)
+    search_fields = ('from_profile__user__email', 'to_profile__user__email')
+    raw_id_fields = ('from_profile', 'to_profile')
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'channel', 'recipient', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('channel', 'status')
+    search_fields = ('recipient',)
+    readonly_fields = ('created_at', 'sent_at')
+
+
+# --- MATCH QUEUE ---
+@admin.register(MatchQueue)
+class MatchQueueAdmin(admin.ModelAdmin):
+    list_display = ('user_profile', 'queue_length', 'needs_refill', 'refilled_at')
+    list_filter = ('needs_refill',)
+    search_fields = ('user_profile__user__email',)
+    readonly_fields = ('refilled_at',)
+
+    def queue_length(self, obj):
+        return len(obj.candidate_ids)
+    queue_length.short_description = "Navbat uzunligi"
+
+
 # --- INTEREST ADMIN ---
 @admin.register(Interest)
 class InterestAdmin(admin.ModelAdmin):
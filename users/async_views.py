@@ -0,0 +1,38 @@
+# users/async_views.py
+#
+# DRF APIView ning async varianti: handler (post va h.k.) `async def` bo'lishi mumkin.
+# Autentifikatsiya / ruxsat / throttling (initial) sinxron kod — alohida threadda
+# bajariladi; handler ichida DB bilan ishlash uchun async ORM (aget, asave, ...) yoki
+# sync_to_async ishlatiladi. ASGI (uvicorn worker) ostida hash kutilayotganda worker
+# boshqa so'rovlarga xizmat qiladi.
+
+from asgiref.sync import sync_to_async
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    async def dispatch(self, request, *args, **kwargs):
+        # APIView.dispatch bilan bir xil, faqat handler await qilinadi
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if hasattr(response, "__await__"):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
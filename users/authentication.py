@@ -0,0 +1,217 @@
+# users/authentication.py
+#
+# user_token (CustomUser.token) orqali foydalanuvchini aniqlash.
+# token -> foydalanuvchining asosiy maydonlari (parolsiz) keshda saqlanadi va CustomUser shulardan DB ga
+# murojaatsiz quriladi; foydalanuvchi saqlanganda yoki o'chirilganda (signals.py)
+# kesh yozuvi o'chiriladi.
+#
+# JWT_PROFILE_CLAIMS_ENABLED bo'lsa login dagi JWT ga profil xulosasi ("ps" claim)
+# qo'shiladi va ProfileClaimsAuthentication undan DB ga murojaatsiz foydalanuvchi quradi.
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+
+from .models import CustomUser, UserProfile
+
+USER_TOKEN_CACHE_TIMEOUT = 300
+# Keshga faqat autentifikatsiya va token view lari uchun kerakli maydonlar yoziladi
+# (parol hashi, last_login va h.k. umumiy keshga tushmasligi kerak); qolganlari
+# kerak bo'lganda deferred maydon sifatida DB dan o'qiladi.
+USER_TOKEN_CACHED_FIELDS = ("id", "uuid", "token", "is_active", "is_staff", "name", "email", "phone", "updated_at")
+
+
+def user_token_cache_key(token):
+    # Token kalitda ochiq turmasligi (va kesh kaliti cheklovlariga tushmasligi) uchun hash
+    return "user_token_%s" % hashlib.sha256(token.encode()).hexdigest()
+
+
+def cached_user_fields(token):
+    """
+    Faol foydalanuvchining USER_TOKEN_CACHED_FIELDS lug'ati yoki None.
+    Natija USER_TOKEN_CACHE_TIMEOUT soniya keshlanadi.
+    """
+    if not token:
+        return None
+    key = user_token_cache_key(token)
+    fields = cache.get(key)
+    if fields is None:
+        fields = (
+            CustomUser.objects.filter(token=token, is_active=True)
+            .values(*USER_TOKEN_CACHED_FIELDS).first()
+        )
+        if fields is None:
+            return None
+        cache.set(key, fields, USER_TOKEN_CACHE_TIMEOUT)
+    return fields
+
+
+def user_id_for_token(token):
+    fields = cached_user_fields(token)
+    return fields["id"] if fields else None
+
+
+def get_user_by_token(token, queryset=None):
+    """
+    user_token bo'yicha CustomUser (yoki None). Odatda keshdagi maydonlardan, so'rovsiz
+    quriladi (qolgan maydonlar deferred); queryset berilsa (select_related va h.k.) DB dan o'qiladi.
+    """
+    fields = cached_user_fields(token)
+    if fields is None:
+        return None
+    if queryset is not None:
+        return queryset.filter(pk=fields["id"], is_active=True).first()
+    # from_db qiymatlarni concrete_fields tartibida kutadi
+    names = [f.attname for f in CustomUser._meta.concrete_fields if f.attname in fields]
+    return CustomUser.from_db(router.db_for_read(CustomUser), names, [fields[name] for name in names])
+
+
+def invalidate_user_token(token):
+    if token:
+        cache.delete(user_token_cache_key(token))
+
+
+class UserTokenAuthentication(BaseAuthentication):
+    """
+    user_token orqali autentifikatsiya: "X-User-Token" sarlavhasi, ?user_token= / ?token=
+    parametri yoki so'rov tanasidagi "token" maydoni (eski mobil klientlar uchun).
+    Token bo'lmasa None (keyingi autentifikator ishlaydi).
+    """
+    header = "HTTP_X_USER_TOKEN"
+    query_params = ("user_token", "token")
+    data_param = "token"
+
+    def get_token(self, request):
+        token = request.META.get(self.header)
+        for param in self.query_params:
+            token = token or request.query_params.get(param)
+        if not token and request.method not in ("GET", "HEAD", "OPTIONS"):
+            data = request.data
+            token = data.get(self.data_param) if hasattr(data, "get") else None
+        return token.strip() if isinstance(token, str) and token.strip() else None
+
+    def authenticate(self, request):
+        token = self.get_token(request)
+        if not token:
+            return None
+        user = get_user_by_token(token)
+        if user is None:
+            raise AuthenticationFailed("Token xato yoki topilmadi.")
+        return user, token
+
+    def authenticate_header(self, request):
+        return "User-Token"
+
+
+class JWTOrUserTokenAuthentication(BaseAuthentication):
+    """
+    "Authorization: Bearer <jwt>" bo'lsa JWT (bir marta tekshiriladi), aks holda user_token.
+    JWT yaroqsiz bo'lib, so'rovda user_token ham bo'lsa — user_token ishlatiladi.
+    Natija DRF tomonidan request.user da saqlanadi, view qayta aniqlamaydi.
+    """
+
+    def __init__(self):
+        self.jwt = JWTAuthentication()
+        self.user_token = UserTokenAuthentication()
+
+    def authenticate(self, request):
+        header = self.jwt.get_header(request)
+        if header is not None and self.jwt.get_raw_token(header) is not None:
+            try:
+                return self.jwt.authenticate(request)
+            except (InvalidToken, AuthenticationFailed):
+                if self.user_token.get_token(request) is None:
+                    raise
+        return self.user_token.authenticate(request)
+
+    def authenticate_header(self, request):
+        return self.jwt.authenticate_header(request)
+
+
+# ---------- JWT dagi profil xulosasi ----------
+
+PROFILE_CLAIM = "ps"
+
+
+def profile_claims(profile):
+    """JWT ga qo'shiladigan ixcham profil xulosasi"""
+    return {
+        "v": profile.claims_version,
+        "pid": profile.id,
+        "tok": profile.user.token,
+        "g": profile.gender,
+        "by": profile.birth_year,
+        "r": profile.region_id,
+        "d": profile.district_id,
+    }
+
+
+def add_profile_claims(token, user):
+    """RefreshToken ga xulosa qo'shadi (access token ga ham ko'chadi); o'chirilgan bo'lsa hech narsa qilmaydi"""
+    if not getattr(settings, "JWT_PROFILE_CLAIMS_ENABLED", False):
+        return token
+    profile = UserProfile.objects.filter(user=user).first()
+    if profile is not None:
+        profile.user = user
+        token[PROFILE_CLAIM] = profile_claims(profile)
+    return token
+
+
+def claims_version_cache_key(user_id):
+    return f"profile_claims_version_{user_id}"
+
+
+def current_claims_version(user_id):
+    key = claims_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = UserProfile.objects.filter(user_id=user_id).values_list("claims_version", flat=True).first()
+        if version is not None:
+            cache.set(key, version, getattr(settings, "JWT_PROFILE_CLAIMS_VERSION_CACHE_SECONDS", 60))
+    return version
+
+
+def invalidate_claims_version(user_id):
+    cache.delete(claims_version_cache_key(user_id))
+
+
+class ProfileClaimsUser(TokenUser):
+    """JWT claimlaridan qurilgan yengil foydalanuvchi (DB dan o'qilmaydi)"""
+
+    @property
+    def profile_summary(self):
+        return self.token[PROFILE_CLAIM]
+
+    @property
+    def token_value(self):
+        return self.profile_summary["tok"]
+
+    def build_profile(self):
+        """Saqlanmagan, faqat xulosa maydonlari to'ldirilgan UserProfile (id bilan)"""
+        summary = self.profile_summary
+        return UserProfile(
+            id=summary["pid"], user_id=self.id, gender=summary["g"], birth_year=summary["by"],
+            region_id=summary["r"], district_id=summary["d"], claims_version=summary["v"],
+        )
+
+
+class ProfileClaimsAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication + profil xulosasi: claim versiyasi joriy versiyaga teng bo'lsa
+    ProfileClaimsUser qaytaradi, aks holda (yoki xulosa bo'lmasa) odatdagidek DB dan.
+    """
+
+    def get_user(self, validated_token):
+        summary = validated_token.get(PROFILE_CLAIM)
+        if summary and getattr(settings, "JWT_PROFILE_CLAIMS_ENABLED", False):
+            user = ProfileClaimsUser(validated_token)
+            if current_claims_version(user.id) == summary.get("v"):
+                return user
+        return super().get_user(validated_token)
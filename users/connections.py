@@ -0,0 +1,104 @@
+# users/connections.py
+#
+# Zapros yuborish / qabul qilish (Connection jadvali ustida).
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Connection, UserProfile
+
+# send_request(s) natijalari
+ALREADY_CONNECTED = "already_connected"
+ALREADY_REQUESTED = "already_requested"
+MATCHED = "matched"
+REQUESTED = "requested"
+NOT_FOUND = "not_found"
+SELF = "self"  # o'ziga zapros — yuborilmaydi
+
+
+def lock_profiles(profile_ids):
+    """
+    Profillarni id tartibida SELECT ... FOR UPDATE bilan qulflaydi (deadlock bo'lmasligi uchun
+    hamma joyda bir xil tartib). Topilgan id lar to'plamini qaytaradi.
+    """
+    return set(
+        UserProfile.objects.select_for_update().filter(id__in=profile_ids).order_by("id").values_list("id", flat=True)
+    )
+
+
+@transaction.atomic
+def send_requests(from_profile_id, to_profile_ids):
+    """
+    from -> har bir to ga zapros. {to_profile_id: natija} qaytaradi
+    (from ning o'z id si ro'yxatda bo'lsa — SELF).
+    Qarshi tomondan zapros bo'lsa, ikkala yo'nalish ACCEPTED bo'ladi (o'zaro obuna).
+
+    Nechta id bo'lishidan qat'i nazar bitta tranzaksiyada uch so'rov: profillarni
+    qulflash, mavjud juftliklarni o'qish va bitta INSERT ... ON CONFLICT DO UPDATE.
+    Qulf tufayli ikki foydalanuvchi bir vaqtda bir-biriga yuborsa ham ikkinchisi
+    birinchisining zaprosini ko'radi va obuna hosil bo'ladi.
+    """
+    to_profile_ids = list(dict.fromkeys(to_profile_ids))
+    results = {from_profile_id: SELF} if from_profile_id in to_profile_ids else {}
+    to_profile_ids = [pid for pid in to_profile_ids if pid != from_profile_id]
+    if not to_profile_ids:
+        return results
+
+    found = lock_profiles([from_profile_id, *to_profile_ids])
+    results.update({pid: NOT_FOUND for pid in to_profile_ids if pid not in found})
+    if from_profile_id not in found:
+        raise UserProfile.DoesNotExist("Profil topilmadi.")
+    targets = [pid for pid in to_profile_ids if pid in found]
+    if not targets:
+        return results
+
+    statuses = dict(
+        ((row[0], row[1]), row[2])
+        for row in Connection.objects.filter(
+            Q(from_profile_id=from_profile_id, to_profile_id__in=targets)
+            | Q(from_profile_id__in=targets, to_profile_id=from_profile_id)
+        ).values_list("from_profile_id", "to_profile_id", "status")
+    )
+
+    now = timezone.now()
+    rows = []
+    for pid in targets:
+        mine = statuses.get((from_profile_id, pid))
+        theirs = statuses.get((pid, from_profile_id))
+        if mine == Connection.ACCEPTED:
+            results[pid] = ALREADY_CONNECTED
+        elif mine == Connection.PENDING:
+            results[pid] = ALREADY_REQUESTED
+        elif theirs is not None:
+            results[pid] = MATCHED
+            rows.append(Connection(from_profile_id=from_profile_id, to_profile_id=pid, status=Connection.ACCEPTED, created_at=now))
+            rows.append(Connection(from_profile_id=pid, to_profile_id=from_profile_id, status=Connection.ACCEPTED, created_at=now))
+        else:
+            results[pid] = REQUESTED
+            rows.append(Connection(from_profile_id=from_profile_id, to_profile_id=pid, status=Connection.PENDING, created_at=now))
+
+    if rows:
+        # Yangi zaproslar oddiy INSERT bo'ladi, obuna bo'lganlar qarshi tomonning
+        # PENDING qatorini ACCEPTED ga yangilaydi — hammasi bitta so'rovda.
+        # created_at ham yangilanadi: obunalar ro'yxati obuna bo'lgan vaqt bo'yicha saralanadi
+        Connection.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["from_profile", "to_profile"],
+            update_fields=["status", "created_at", "updated_at"],
+        )
+    return results
+
+
+def send_request(from_profile_id, to_profile_id):
+    """
+    Bitta zapros (send_requests bilan bir xil uch so'rov).
+    to_profile topilmasa UserProfile.DoesNotExist, o'ziga bo'lsa ValueError.
+    """
+    result = send_requests(from_profile_id, [to_profile_id]).get(to_profile_id, NOT_FOUND)
+    if result == SELF:
+        raise ValueError("O'zingizga zapros yuborib bo'lmaydi.")
+    if result == NOT_FOUND:
+        raise UserProfile.DoesNotExist("Profil topilmadi.")
+    return result
@@ -1,10 +1,12 @@
-from .models import CustomUser
+from .models import CustomUser, GEO_CELL_SIZE, UserProfileExtension
 from rest_framework.response import Response
 from rest_framework import status
-from math import radians, sin, cos, sqrt, atan2
-from django.core.mail import send_mail
-from django.conf import settings
-import requests
+from math import radians, degrees, sin, asin, cos, sqrt, atan2, floor
+import base64
+import hashlib
+import json
+import numpy as np
+from django.core.cache import cache
 
 def haversine_distance(lat1, lon1, lat2, lon2):
     # Yer radiusi kilometrda
@@ -23,23 +25,268 @@ def haversine_distance(lat1, lon1, lat2, lon2):
     return distance
 
 
+def haversine_distances(lat, lon, lats, lons, radius_km=None):
+    """
+    Bitta nuqtadan (lat, lon) ko'plab nuqtalargacha bo'lgan masofalarni
+    NumPy yordamida bir martada hisoblaydi.
+
+    Qaytaradi: (distances, mask) — distances km da, mask esa
+    distances <= radius_km bo'lganlar uchun True (radius_km berilmasa hammasi True).
+    """
+    R = 6371.0
+
+    lats_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lons_rad = np.radians(np.asarray(lons, dtype=np.float64))
+    lat_rad, lon_rad = radians(lat), radians(lon)
+
+    dlat = lats_rad - lat_rad
+    dlon = lons_rad - lon_rad
+
+    a = np.sin(dlat / 2) ** 2 + cos(lat_rad) * np.cos(lats_rad) * np.sin(dlon / 2) ** 2
+    distances = 2 * R * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    if radius_km is None:
+        mask = np.ones(distances.shape, dtype=bool)
+    else:
+        mask = distances <= radius_km
+    return distances, mask
+
+
+def nearest_first(ids, distances, limit, after=None):
+    """
+    Masofa bo'yicha eng yaqin `limit` tasini (ids, distances) ko'rinishida qaytaradi.
+    Tartib (masofa, id) bo'yicha; after=(masofa, id) berilsa, undan keyingilar olinadi.
+    Butun massiv saralanmaydi — faqat kerakli qism (argpartition).
+    """
+    ids = np.asarray(ids, dtype=np.int64)
+    distances = np.asarray(distances, dtype=np.float64)
+
+    if after is not None:
+        after_distance, after_id = after
+        keep = (distances > after_distance) | ((distances == after_distance) & (ids > after_id))
+        ids, distances = ids[keep], distances[keep]
+
+    if limit is not None and len(ids) > limit:
+        if limit <= 0:
+            return ids[:0], distances[:0]
+        kth = distances[np.argpartition(distances, limit - 1)[limit - 1]]
+        keep = distances <= kth
+        ids, distances = ids[keep], distances[keep]
+
+    order = np.lexsort((ids, distances))
+    if limit is not None:
+        order = order[:limit]
+    return ids[order], distances[order]
+
+
+def nearest_in_rows(rows, lat, lon, radius_km, limit, after=None, chunk_size=2000):
+    """
+    (id, lat, lon) qatorlari oqimidan radius ichidagi eng yaqin `limit` tasini tanlaydi.
+    Qatorlar bo'laklab qayta ishlanadi — xotirada bir bo'lak va limit ta natija turadi.
+    """
+    best_ids = np.empty(0, dtype=np.int64)
+    best_distances = np.empty(0, dtype=np.float64)
+
+    def merge(chunk):
+        ids, lats, lons = zip(*chunk)
+        distances, mask = haversine_distances(lat, lon, lats, lons, radius_km=radius_km)
+        return nearest_first(
+            np.concatenate([best_ids, np.asarray(ids, dtype=np.int64)[mask]]),
+            np.concatenate([best_distances, distances[mask]]),
+            limit, after,
+        )
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            best_ids, best_distances = merge(chunk)
+            chunk = []
+    if chunk:
+        best_ids, best_distances = merge(chunk)
+    return best_ids, best_distances
 
 
-def send_email_code(email, code):
-    subject = "Tasdiqlash kodi"
-    message = f"Sizning tasdiqlash kodingiz: {code}"
+def encode_cursor(values):
+    """Kursor qiymatlarini (ro'yxat) URL uchun xavfsiz satrga aylantiradi."""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """encode_cursor teskarisi. Noto'g'ri kursor uchun ValueError."""
     try:
-        send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email])
-    except Exception as e:
-        print(f"Email yuborishda xatolik: {e}")
-
-def send_telegram_code(message, chat_ids=None):
-    if chat_ids is None:
-        chat_ids = [settings.TELEGRAM_USER_ID1]
-    for chat_id in chat_ids:
-        url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-        payload = {"chat_id": chat_id, "text": message}
-        try:
-            requests.post(url, json=payload)
-        except Exception as e:
-            print(f"Telegramga yuborishda xatolik: {e}")
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+# Bundan ko'p katak chiqsa geo_cell__in o'rniga faqat bounding-box ishlatiladi
+MAX_GEO_CELLS = 64
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    (lat, lon) atrofidagi radius_km doirani o'z ichiga oluvchi to'rtburchak:
+    (min_lat, max_lat, min_lon, max_lon)
+    """
+    # haversine_distance bilan bir xil R — chekkadagi nuqtalar qutidan tushib qolmasligi uchun
+    R = 6371.0
+    d = radius_km / R
+    dlat = degrees(d)
+    if lat + dlat >= 90.0 or lat - dlat <= -90.0:
+        # Doira qutbni o'z ichiga oladi — barcha uzunliklar
+        dlon = 180.0
+    else:
+        # Doiraning eng katta uzunlik farqi: asin(sin(d) / cos(lat)) (d / cos(lat) dan katta)
+        dlon = degrees(asin(sin(d) / cos(radians(lat))))
+    return (
+        max(lat - dlat, -90.0), min(lat + dlat, 90.0),
+        max(lon - dlon, -180.0), min(lon + dlon, 180.0),
+    )
+
+
+def geo_cells_for_bbox(min_lat, max_lat, min_lon, max_lon):
+    """
+    Bounding-box ni qoplaydigan grid kataklar ro'yxati (UserProfile.geo_cell formatida).
+    Kataklar soni MAX_GEO_CELLS dan oshsa None qaytaradi.
+    """
+    lat_from, lat_to = floor(min_lat / GEO_CELL_SIZE), floor(max_lat / GEO_CELL_SIZE)
+    lon_from, lon_to = floor(min_lon / GEO_CELL_SIZE), floor(max_lon / GEO_CELL_SIZE)
+    if (lat_to - lat_from + 1) * (lon_to - lon_from + 1) > MAX_GEO_CELLS:
+        return None
+    return [
+        f"{i}:{j}"
+        for i in range(lat_from, lat_to + 1)
+        for j in range(lon_from, lon_to + 1)
+    ]
+
+
+def nearby_profiles_queryset(queryset, lat, lon, radius_km):
+    """
+    Faqat atrofdagi kataklar va bounding-box ichidagi profillarni qoldiradi.
+    Aniq masofa tekshiruvi (haversine) keyin qilinadi.
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    queryset = queryset.filter(
+        latitude__range=(min_lat, max_lat),
+        longitude__range=(min_lon, max_lon),
+    )
+    cells = geo_cells_for_bbox(min_lat, max_lat, min_lon, max_lon)
+    if cells is not None:
+        queryset = queryset.filter(geo_cell__in=cells)
+    return queryset
+
+
+
+
+# Interest/Purpose katalogi uchun bitmask: id -> bit raqami.
+# BigIntegerField ishorasiz qolishi uchun 0..62 bitlar ishlatiladi;
+# bundan katta id lar maskaga kirmaydi (ids_fit_mask orqali tekshiriladi).
+MASK_BITS = 63
+
+
+def ids_to_mask(ids):
+    mask = 0
+    for i in ids:
+        if 0 <= i < MASK_BITS:
+            mask |= 1 << i
+    return mask
+
+
+def ids_fit_mask(ids):
+    return all(0 <= i < MASK_BITS for i in ids)
+
+
+def mask_overlap(a, b):
+    """Ikki maskadagi umumiy elementlar soni"""
+    return (a & b).bit_count()
+
+
+def mask_jaccard(a, b):
+    """|A ∩ B| / |A ∪ B| (ikkalasi bo'sh bo'lsa 0)"""
+    union = (a | b).bit_count()
+    return (a & b).bit_count() / union if union else 0.0
+
+
+def mask_overlaps(mask, masks):
+    """Bitta maska va maskalar massivi uchun umumiy elementlar soni (NumPy)"""
+    masks = np.asarray(masks, dtype=np.uint64)
+    return np.bitwise_count(masks & np.uint64(mask)).astype(np.int64)
+
+
+def mask_jaccards(mask, masks):
+    """Bitta maska va maskalar massivi uchun Jaccard o'xshashligi (NumPy)"""
+    masks = np.asarray(masks, dtype=np.uint64)
+    mask = np.uint64(mask)
+    intersection = np.bitwise_count(masks & mask).astype(np.float64)
+    union = np.bitwise_count(masks | mask).astype(np.float64)
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+class BloomFilter:
+    """
+    Ixcham "ko'rilganmi?" to'plami: xotira hajmi o'zgarmas (num_bits / 8 bayt),
+    yolg'on "bor" javobi ehtimoli kichik, yolg'on "yo'q" javobi bo'lmaydi.
+    """
+
+    def __init__(self, data=None, num_bits=65536, num_hashes=4):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        size = num_bits // 8
+        if data and len(data) == size:
+            self.bits = bytearray(data)
+        else:
+            self.bits = bytearray(size)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+
+# Bloklash to'plami keshda qancha turadi (boshqa workerlardagi keshlar uchun eskirish chegarasi)
+BLOCK_CACHE_TIMEOUT = 300
+
+
+def block_cache_key(profile_id):
+    return f"users:blocks:{profile_id}"
+
+
+def blocked_profile_ids(profile_id):
+    """
+    Profil bloklagan va uni bloklagan profillar id lari (ikki tomonlama), keshdan.
+    Kesh bo'sh bo'lsa bitta UNION so'rov bilan yuklanadi.
+    """
+    key = block_cache_key(profile_id)
+    ids = cache.get(key)
+    if ids is None:
+        through = UserProfileExtension.blocked_users.through
+        blocked = through.objects.filter(
+            userprofileextension__user_profile_id=profile_id
+        ).values_list("userprofile_id", flat=True)
+        blocking = through.objects.filter(
+            userprofile_id=profile_id
+        ).values_list("userprofileextension__user_profile_id", flat=True)
+        ids = frozenset(blocked.union(blocking))
+        cache.set(key, ids, BLOCK_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_block_cache(profile_ids):
+    cache.delete_many([block_cache_key(pid) for pid in profile_ids])
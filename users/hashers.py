@@ -0,0 +1,40 @@
+# users/hashers.py
+#
+# Narxi (cost) settings orqali sozlanadigan parol hasherlari.
+# algorithm nomlari Django dagilar bilan bir xil — mavjud hashlar o'zgarishsiz tekshiriladi,
+# cost o'zgarsa foydalanuvchi keyingi login da yangi parametrlar bilan qayta hashlanadi.
+# argon2 / bcrypt uchun argon2-cffi / bcrypt paketlari kerak (ixtiyoriy).
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_PBKDF2_ITERATIONS", PBKDF2PasswordHasher.iterations)
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    @property
+    def time_cost(self):
+        return getattr(settings, "PASSWORD_ARGON2_TIME_COST", Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return getattr(settings, "PASSWORD_ARGON2_MEMORY_COST", Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return getattr(settings, "PASSWORD_ARGON2_PARALLELISM", Argon2PasswordHasher.parallelism)
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    @property
+    def rounds(self):
+        return getattr(settings, "PASSWORD_BCRYPT_ROUNDS", BCryptSHA256PasswordHasher.rounds)
+
@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.functions import block_cache_key, blocked_profile_ids
+from users.matching import Excluding, build_match_queryset, sample_match_ids
+from users.models import CustomUser, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Bloklash to'plamining (blocked_profile_ids) qidiruvga qo'shadigan xarajatini o'lchaydi. "
+        "Sun'iy ma'lumotlar oxirida o'chiriladi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=5000)
+        parser.add_argument("--blocks", type=int, default=200, help="Foydalanuvchi bloklagan profillar soni.")
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        iterations = options["iterations"]
+        with transaction.atomic():
+            me, others = self.seed(options["profiles"])
+            blocked = random.sample(others, min(options["blocks"], len(others)))
+            me.extension.blocked_users.add(*blocked)
+            # Teskari yo'nalish: ba'zilar ham meni bloklagan
+            for profile in random.sample(others, min(options["blocks"] // 4, len(others))):
+                profile.extension.blocked_users.add(me)
+
+            def cold():
+                cache.delete(block_cache_key(me.id))
+                return blocked_profile_ids(me.id)
+
+            cold_time = self.measure(iterations, cold)
+            warm_time = self.measure(iterations, lambda: blocked_profile_ids(me.id))
+
+            queryset = build_match_queryset(me)
+            block_set = blocked_profile_ids(me.id)
+            plain_time = self.measure(iterations, lambda: sample_match_ids(queryset, 10))
+            filtered_time = self.measure(
+                iterations, lambda: sample_match_ids(queryset, 10, exclude=Excluding(set(), block_set))
+            )
+
+            self.stdout.write(f"profiles={len(others) + 1} block set size={len(block_set)}")
+            self.stdout.write(f"block set, cache miss:   {cold_time * 1000:8.3f} ms")
+            self.stdout.write(f"block set, cache hit:    {warm_time * 1000:8.3f} ms")
+            self.stdout.write(f"sample 10, no blocks:    {plain_time * 1000:8.3f} ms")
+            self.stdout.write(f"sample 10, with blocks:  {filtered_time * 1000:8.3f} ms")
+            transaction.set_rollback(True)
+        cache.delete(block_cache_key(me.id))
+
+    @staticmethod
+    def measure(iterations, func):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - started) / iterations
+
+    @staticmethod
+    def seed(count):
+        users = CustomUser.objects.bulk_create([
+            CustomUser(email=f"block-bench{i}@bench.local", name=f"bench{i}", token=f"block-bench-token-{i}")
+            for i in range(count)
+        ], batch_size=1000)
+        me = UserProfile.objects.create(user=users[0], gender="male", birth_year=1990)
+        others = [
+            UserProfile.objects.create(user=user, gender=random.choice(["male", "female"]), birth_year=random.randint(1990, 2006))
+            for user in users[1:]
+        ]
+        return me, others
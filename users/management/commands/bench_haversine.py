@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from users.functions import haversine_distance, haversine_distances
+
+
+class Command(BaseCommand):
+    help = "Skalyar haversine_distance va vektorli haversine_distances tezligini solishtiradi."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+            help="Sinov uchun nuqtalar soni (bir nechta qiymat berish mumkin).",
+        )
+        parser.add_argument("--radius", type=float, default=5.0, help="Radius (km).")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options["seed"])
+        origin_lat, origin_lon = 41.3111, 69.2797  # Toshkent
+        radius = options["radius"]
+
+        self.stdout.write(f"{'points':>10} {'scalar, s':>12} {'numpy, s':>12} {'speedup':>10} {'in radius':>10}")
+        for size in options["sizes"]:
+            lats = origin_lat + rng.uniform(-1.0, 1.0, size)
+            lons = origin_lon + rng.uniform(-1.0, 1.0, size)
+            lat_list, lon_list = lats.tolist(), lons.tolist()
+
+            started = time.perf_counter()
+            scalar_hits = sum(
+                1 for la, lo in zip(lat_list, lon_list)
+                if haversine_distance(origin_lat, origin_lon, la, lo) <= radius
+            )
+            scalar_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            _, mask = haversine_distances(origin_lat, origin_lon, lats, lons, radius_km=radius)
+            numpy_hits = int(mask.sum())
+            numpy_time = time.perf_counter() - started
+
+            if scalar_hits != numpy_hits:
+                self.stderr.write(f"Natijalar mos emas: {scalar_hits} != {numpy_hits}")
+
+            self.stdout.write(
+                f"{size:>10} {scalar_time:>12.4f} {numpy_time:>12.4f} "
+                f"{scalar_time / numpy_time:>9.1f}x {numpy_hits:>10}"
+            )
@@ -0,0 +1,130 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.functions import ids_to_mask, mask_overlaps
+from users.matching import MATCH_SCORE_WEIGHTS, build_match_queryset, rank_match_candidates
+from users.models import CustomUser, District, Interest, Purpose, Region, UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Sun'iy ma'lumotlar bilan SQL tomonidagi moslik reytingini (rank_match_candidates) "
+        "nomzodlarni Python ga yuklab hisoblash bilan solishtiradi. Ma'lumotlar oxirida o'chiriladi."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", type=int, default=5000, help="Yaratiladigan profillar soni.")
+        parser.add_argument("--users", type=int, default=20, help="Nechta foydalanuvchi uchun o'lchanadi.")
+        parser.add_argument("--top", type=int, default=20, help="top-k.")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options["seed"])
+        with transaction.atomic():
+            profiles = self.seed(options["profiles"])
+            sample = random.sample(profiles, min(options["users"], len(profiles)))
+            k = options["top"]
+
+            sql_time = self.measure(sample, lambda p: rank_match_candidates(p, k))
+            python_time = self.measure(sample, lambda p: self.rank_in_python(p, k))
+            numpy_time = self.measure(sample, lambda p: self.rank_with_masks(p, k))
+
+            self.stdout.write(f"profiles={len(profiles)} users={len(sample)} top={k}")
+            self.stdout.write(f"SQL ranking:    {sql_time * 1000:8.2f} ms / user")
+            self.stdout.write(f"Python ranking: {python_time * 1000:8.2f} ms / user")
+            self.stdout.write(f"NumPy bitmask:  {numpy_time * 1000:8.2f} ms / user")
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(profiles, func):
+        started = time.perf_counter()
+        for profile in profiles:
+            func(profile)
+        return (time.perf_counter() - started) / len(profiles)
+
+    @staticmethod
+    def rank_in_python(profile, k):
+        purpose_ids = set(profile.purposes.values_list("id", flat=True))
+        interest_ids = set(profile.interests.values_list("id", flat=True))
+        weights = MATCH_SCORE_WEIGHTS
+        scored = []
+        for candidate in build_match_queryset(profile).prefetch_related("purposes", "interests"):
+            score = (
+                weights["shared_interests"] * len(interest_ids & {i.id for i in candidate.interests.all()})
+                + weights["shared_purposes"] * len(purpose_ids & {p.id for p in candidate.purposes.all()})
+                + weights["same_district"] * (candidate.district_id == profile.district_id is not None)
+                + weights["same_region"] * (candidate.region_id == profile.region_id is not None)
+                + weights["age_distance"] * abs((candidate.birth_year or 0) - (profile.birth_year or 0))
+            )
+            scored.append((-score, candidate.id))
+        scored.sort()
+        return [(pid, -score) for score, pid in scored[:k]]
+
+    @staticmethod
+    def rank_with_masks(profile, k):
+        rows = list(build_match_queryset(profile).values_list(
+            "id", "interests_mask", "purposes_mask", "district_id", "region_id", "birth_year"
+        ))
+        if not rows:
+            return []
+        ids, interests, purposes, districts, regions, birth_years = zip(*rows)
+        weights = MATCH_SCORE_WEIGHTS
+        districts = np.array([d or 0 for d in districts])
+        regions = np.array([r or 0 for r in regions])
+        birth_years = np.array([b or 0 for b in birth_years])
+        scores = (
+            weights["shared_interests"] * mask_overlaps(profile.interests_mask, interests)
+            + weights["shared_purposes"] * mask_overlaps(profile.purposes_mask, purposes)
+            + weights["same_district"] * ((districts == profile.district_id) & (districts != 0))
+            + weights["same_region"] * ((regions == profile.region_id) & (regions != 0))
+            + weights["age_distance"] * np.abs(birth_years - (profile.birth_year or 0))
+        )
+        ids = np.array(ids)
+        order = np.lexsort((ids, -scores))[:k]
+        return list(zip(ids[order].tolist(), scores[order].tolist()))
+
+    def seed(self, count):
+        regions = [Region.objects.create(name=f"bench-region-{i}") for i in range(14)]
+        districts = [
+            District.objects.create(region=region, name=f"bench-district-{j}")
+            for region in regions for j in range(10)
+        ]
+        interests = [Interest.objects.create(title=f"bench-interest-{i}") for i in range(30)]
+        purposes = [Purpose.objects.create(title=f"bench-purpose-{i}") for i in range(6)]
+
+        users = CustomUser.objects.bulk_create([
+            CustomUser(email=f"bench{i}@bench.local", name=f"bench{i}", token=f"bench-token-{i}")
+            for i in range(count)
+        ], batch_size=1000)
+
+        profiles, links = [], []
+        for user in users:
+            district = random.choice(districts)
+            chosen_interests = random.sample(interests, random.randint(0, 6))
+            chosen_purposes = random.sample(purposes, random.randint(0, 2))
+            links.append((chosen_interests, chosen_purposes))
+            profiles.append(UserProfile(
+                user=user,
+                gender=random.choice(["male", "female"]),
+                birth_year=random.randint(1975, 2006),
+                region_id=district.region_id,
+                district=district,
+                # bulk_create m2m_changed signalini chaqirmaydi — maskalarni shu yerda hisoblaymiz
+                interests_mask=ids_to_mask(i.id for i in chosen_interests),
+                purposes_mask=ids_to_mask(p.id for p in chosen_purposes),
+            ))
+        profiles = UserProfile.objects.bulk_create(profiles, batch_size=1000)
+
+        interest_links, purpose_links = [], []
+        for profile, (chosen_interests, chosen_purposes) in zip(profiles, links):
+            for interest in chosen_interests:
+                interest_links.append(UserProfile.interests.through(userprofile_id=profile.id, interest_id=interest.id))
+            for purpose in chosen_purposes:
+                purpose_links.append(UserProfile.purposes.through(userprofile_id=profile.id, purpose_id=purpose.id))
+        UserProfile.interests.through.objects.bulk_create(interest_links, batch_size=5000)
+        UserProfile.purposes.through.objects.bulk_create(purpose_links, batch_size=5000)
+        return profiles
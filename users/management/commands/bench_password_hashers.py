@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users.hashers import TunedArgon2PasswordHasher, TunedBCryptSHA256PasswordHasher, TunedPBKDF2PasswordHasher
+from users.passwords import PasswordHashPool
+
+PASSWORD = "correct horse battery staple"
+
+
+class Command(BaseCommand):
+    help = (
+        "Parol hasherlarini solishtiradi: bitta yadroda va login view lar ishlatadigan "
+        "password_pool da sekundiga nechta login (check_password) bajarilishi. "
+        "Standart qiymatlar — settings dagi (deploy qilinadigan) parametrlar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=3.0, help="Har bir konfiguratsiya uchun vaqt.")
+        parser.add_argument("--workers", type=int, help="Pool threadlari (standart: PASSWORD_HASH_WORKERS yoki yadrolar soni).")
+        parser.add_argument("--pbkdf2-iterations", type=int, nargs="+", help="Standart: PASSWORD_PBKDF2_ITERATIONS")
+        parser.add_argument("--argon2-memory", type=int, nargs="+", help="KiB; standart: PASSWORD_ARGON2_MEMORY_COST")
+        parser.add_argument("--argon2-time", type=int, help="Standart: PASSWORD_ARGON2_TIME_COST")
+        parser.add_argument("--argon2-parallelism", type=int, help="Standart: PASSWORD_ARGON2_PARALLELISM")
+        parser.add_argument("--bcrypt-rounds", type=int, nargs="+", help="Standart: PASSWORD_BCRYPT_ROUNDS")
+
+    def handle(self, *args, **options):
+        iterations = options["pbkdf2_iterations"] or [settings.PASSWORD_PBKDF2_ITERATIONS]
+        memories = options["argon2_memory"] or [settings.PASSWORD_ARGON2_MEMORY_COST]
+        time_cost = options["argon2_time"] or settings.PASSWORD_ARGON2_TIME_COST
+        parallelism = options["argon2_parallelism"] or settings.PASSWORD_ARGON2_PARALLELISM
+        rounds = options["bcrypt_rounds"] or [settings.PASSWORD_BCRYPT_ROUNDS]
+
+        configs = [
+            (f"pbkdf2 iterations={n}", TunedPBKDF2PasswordHasher, {"PASSWORD_PBKDF2_ITERATIONS": n})
+            for n in iterations
+        ]
+        configs += [
+            (f"argon2 t={time_cost} m={m}KiB p={parallelism}", TunedArgon2PasswordHasher, {
+                "PASSWORD_ARGON2_TIME_COST": time_cost,
+                "PASSWORD_ARGON2_MEMORY_COST": m,
+                "PASSWORD_ARGON2_PARALLELISM": parallelism,
+            })
+            for m in memories
+        ]
+        configs += [
+            (f"bcrypt rounds={r}", TunedBCryptSHA256PasswordHasher, {"PASSWORD_BCRYPT_ROUNDS": r})
+            for r in rounds
+        ]
+
+        workers = options["workers"] or settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        pool_label = f"login/s (pool {workers} thr)"
+        self.stdout.write(f"{'hasher':<36} {'ms/login':>10} {'login/s/yadro':>14} {pool_label:>22}")
+        for label, hasher_class, overrides in configs:
+            hasher = hasher_class()
+            try:
+                if hasher.library:
+                    hasher._load_library()
+            except ValueError:
+                missing = "kutubxona o'rnatilmagan"
+                self.stdout.write(f"{label:<36} {missing:>48}")
+                continue
+            with override_settings(**overrides):
+                encoded = hasher.encode(PASSWORD, hasher.salt())
+                single = self.measure(hasher, encoded, options["seconds"])
+                pooled = asyncio.run(self.measure_pool(hasher, encoded, options["seconds"], workers))
+            self.stdout.write(f"{label:<36} {1000 / single:>10.1f} {single:>14.1f} {pooled:>22.1f}")
+
+    @staticmethod
+    def measure(hasher, encoded, seconds):
+        """Bitta threadda sekundiga nechta parol tekshiruvi"""
+        deadline = time.perf_counter() + seconds
+        start = time.perf_counter()
+        count = 0
+        while time.perf_counter() < deadline:
+            hasher.verify(PASSWORD, encoded)
+            count += 1
+        return count / (time.perf_counter() - start)
+
+    @staticmethod
+    async def measure_pool(hasher, encoded, seconds, workers):
+        """
+        PasswordHashPool (view lardagi password_pool bilan bir xil klass) orqali: workers ta
+        parallel so'rov pool ni doimo band qilib turadi.
+        """
+        pool = PasswordHashPool(workers=workers, queue_size=workers, wait_timeout=seconds)
+        deadline = time.perf_counter() + seconds
+
+        async def client():
+            count = 0
+            while time.perf_counter() < deadline:
+                await pool.run(hasher.verify, PASSWORD, encoded)
+                count += 1
+            return count
+
+        start = time.perf_counter()
+        try:
+            total = sum(await asyncio.gather(*(client() for _ in range(workers))))
+        finally:
+            pool.shutdown()
+        return total / (time.perf_counter() - start)
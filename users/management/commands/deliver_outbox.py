@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    help = "Navbatdagi (OutboxMessage) OTP xabarlarini email / Telegram orqali yuboradi."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Bir aylanishda nechta xabar.")
+        parser.add_argument("--concurrency", type=int, default=None, help="Parallel yuborishlar soni.")
+        parser.add_argument("--timeout", type=float, default=None, help="Bitta yuborish uchun timeout (soniya).")
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Doimiy ishlash (worker rejimi): navbatni har --interval soniyada tekshiradi.",
+        )
+        parser.add_argument("--interval", type=float, default=1.0)
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = deliver_pending(options["batch_size"], options["concurrency"], options["timeout"])
+            if sent or failed:
+                self.stdout.write(f"{sent} ta yuborildi, {failed} ta xato.")
+            if not options["loop"]:
+                break
+            if sent + failed < options["batch_size"]:
+                time.sleep(options["interval"])
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from users.matching import refill_match_queue
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Kamayib qolgan yoki eskirgan match navbatlarini (MatchQueue) qayta to'ldiradi."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Bir aylanishda nechta navbat.")
+        parser.add_argument("--all", action="store_true", help="Barcha navbatlarni bir martada qayta to'ldirish.")
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Doimiy ishlash (worker rejimi): navbatlarni har --interval soniyada tekshiradi.",
+        )
+        parser.add_argument("--interval", type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        while True:
+            refilled = self.refill_batch(options["batch_size"], options["all"])
+            if refilled:
+                self.stdout.write(f"{refilled} ta navbat to'ldirildi.")
+            if not options["loop"] or options["all"]:
+                break
+            if refilled < options["batch_size"]:
+                time.sleep(options["interval"])
+
+    def refill_batch(self, batch_size, refill_all=False):
+        profiles = UserProfile.objects.exclude(gender__isnull=True).order_by("id")
+        if refill_all:
+            profiles = profiles.iterator(chunk_size=batch_size)
+        else:
+            profiles = profiles.filter(
+                Q(match_queue__isnull=True) | Q(match_queue__needs_refill=True)
+            )[:batch_size]
+
+        count = 0
+        for profile in profiles:
+            refill_match_queue(profile)
+            count += 1
+        return count
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from users.models import UserProfileExtension
+from users.quota import QUOTA_PERIOD
+
+
+class Command(BaseCommand):
+    help = (
+        "Barcha foydalanuvchilarning kunlik so'rovlar limitini (requests_left) tiklaydi. "
+        "id oraliqlari bo'yicha bo'laklangan UPDATE lar bilan ishlaydi (tungi cron uchun)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Bitta UPDATE dagi id oralig'i.")
+        parser.add_argument(
+            "--expired-only", action="store_true",
+            help="Faqat sutkalik oynasi tugagan yozuvlarni tiklash.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        now = timezone.now()
+        queryset = UserProfileExtension.objects.all()
+        if options["expired_only"]:
+            queryset = queryset.filter(last_reset__lte=now - QUOTA_PERIOD)
+
+        bounds = queryset.aggregate(low=Min("id"), high=Max("id"))
+        if bounds["low"] is None:
+            self.stdout.write("Tiklanadigan yozuv yo'q.")
+            return
+
+        total = 0
+        for start in range(bounds["low"], bounds["high"] + 1, batch_size):
+            total += queryset.filter(id__gte=start, id__lt=start + batch_size).update(
+                requests_left=F("daily_requests_limit"), last_reset=now,
+            )
+        self.stdout.write(self.style.SUCCESS(f"{total} ta limit tiklandi."))
@@ -0,0 +1,337 @@
+# users/matching.py
+#
+# "search/byprofile/" uchun nomzodlarni tanlash mantiqi.
+
+import random
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Func, IntegerField, Max, Min, OuterRef, Q, Subquery, Value, When, Window
+from django.db.models.functions import Abs, Coalesce, RowNumber
+from django.db.models.lookups import GreaterThan
+from django.utils import timezone
+
+from .functions import MASK_BITS, blocked_profile_ids, ids_fit_mask, ids_to_mask
+from .models import MatchQueue, SeenProfiles, UserProfile
+
+# Bitta tasodifiy tanlashda tekshiriladigan id lar soni va qayta urinishlar
+MATCH_RANDOM_PROBES = 64
+MATCH_RANDOM_ROUNDS = 3
+# has_match_candidates bitta so'rovda o'qiydigan id lar soni
+MATCH_SCAN_CHUNK = 1000
+
+# Navbatdagi nomzodlar soni va qayta to'ldirish chegarasi
+MATCH_QUEUE_SIZE = 100
+MATCH_QUEUE_LOW_WATERMARK = 20
+# Ko'rilgan/bloklanganlar o'rnini to'ldirish uchun navbat hajmidan necha barobargacha nomzod olinadi
+MATCH_QUEUE_MAX_FETCH = 8
+
+# Moslik balli og'irliklari (ranked rejim)
+MATCH_SCORE_WEIGHTS = {
+    "shared_interests": 3.0,
+    "shared_purposes": 4.0,
+    "same_district": 3.0,
+    "same_region": 1.5,
+    "age_distance": -0.25,  # har bir yil farqi uchun
+}
+
+
+class BitCount(Func):
+    """Butun sondagi 1 bitlar soni (popcount)."""
+    function = "bit_count"
+    output_field = IntegerField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        # Umumiy SQL: har bir bitni alohida qo'shish (SQLite va boshqalar uchun)
+        sql, params = compiler.compile(self.source_expressions[0])
+        terms = " + ".join(f"((({sql}) >> {bit}) & 1)" for bit in range(MASK_BITS))
+        return f"({terms})", list(params) * MASK_BITS
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        sql, params = compiler.compile(self.source_expressions[0])
+        return f"bit_count(CAST(({sql}) AS bit(64)))", params
+
+
+# (maska maydoni, through model, through dagi id maydoni)
+PURPOSES = ("purposes_mask", UserProfile.purposes.through, "purpose_id")
+INTERESTS = ("interests_mask", UserProfile.interests.through, "interest_id")
+
+
+def _overlap_filter(catalogue, ids):
+    """Nomzodda ids dan kamida bittasi bor — iloji bo'lsa bitmask, aks holda subquery orqali"""
+    mask_field, through, id_field = catalogue
+    if not ids:
+        return Q()
+    if ids_fit_mask(ids):
+        return Q(GreaterThan(F(mask_field).bitand(ids_to_mask(ids)), 0))
+    return Q(id__in=through.objects.filter(**{f"{id_field}__in": ids}).values("userprofile_id"))
+
+
+def opposite_gender(gender):
+    return "female" if gender == "male" else "male"
+
+
+def build_match_queryset(profile):
+    """
+    Profil uchun mos nomzodlar queryseti: qarama-qarshi jins, yosh oralig'i va
+    viloyat / tuman / maqsad / qiziqishlardan kamida bittasi mos kelishi kerak.
+    Maqsad/qiziqishlar bitmask (yoki subquery) orqali tekshiriladi, JOIN va .distinct() kerak emas.
+    """
+    current_year = datetime.now().year
+    user_age = current_year - profile.birth_year if profile.birth_year else None
+
+    min_age, max_age = 18, user_age if user_age else 45
+    min_birth_year = current_year - max_age
+    max_birth_year = current_year - min_age
+
+    filters = Q(gender=opposite_gender(profile.gender)) & Q(birth_year__range=(min_birth_year, max_birth_year))
+
+    region_filter = Q(region_id=profile.region_id) if profile.region_id else Q()
+    district_filter = Q(district_id=profile.district_id) if profile.district_id else Q()
+
+    # purposes va interests optional
+    purposes_filter = _overlap_filter(PURPOSES, list(profile.purposes.values_list("id", flat=True)))
+    interests_filter = _overlap_filter(INTERESTS, list(profile.interests.values_list("id", flat=True)))
+
+    # Har bir filter optional OR bilan birlashtiriladi
+    return UserProfile.objects.filter(
+        filters & (region_filter | district_filter | purposes_filter | interests_filter)
+    ).exclude(id=profile.id)
+
+
+def _shared_count(catalogue, ids):
+    """
+    Nomzodning berilgan ro'yxat bilan umumiy qiymatlar soni: bitmask bo'yicha popcount,
+    maskaga sig'maydigan id lar bo'lsa korrelyatsiyalangan subquery.
+    """
+    mask_field, through, id_field = catalogue
+    if not ids:
+        return Value(0, output_field=IntegerField())
+    if ids_fit_mask(ids):
+        return BitCount(F(mask_field).bitand(ids_to_mask(ids)))
+    shared = (
+        through.objects.filter(userprofile_id=OuterRef("pk"), **{f"{id_field}__in": ids})
+        .order_by()
+        .values("userprofile_id")
+        .annotate(c=Count("*"))
+        .values("c")
+    )
+    return Coalesce(Subquery(shared, output_field=IntegerField()), 0)
+
+
+def annotate_match_score(queryset, profile, purpose_ids=None, interest_ids=None):
+    """
+    Har bir nomzodga moslik balini (score) bitta SQL so'rovda hisoblaydi:
+    umumiy qiziqishlar/maqsadlar soni, bir xil tuman/viloyat va yosh farqi.
+    """
+    if purpose_ids is None:
+        purpose_ids = list(profile.purposes.values_list("id", flat=True))
+    if interest_ids is None:
+        interest_ids = list(profile.interests.values_list("id", flat=True))
+
+    def flag(**lookup):
+        if None in lookup.values():
+            return Value(0, output_field=IntegerField())
+        return Case(When(then=Value(1), **lookup), default=Value(0), output_field=IntegerField())
+
+    if profile.birth_year:
+        age_distance = Coalesce(
+            Abs(ExpressionWrapper(F("birth_year") - Value(int(profile.birth_year)), output_field=IntegerField())),
+            Value(0),
+            output_field=IntegerField(),
+        )
+    else:
+        age_distance = Value(0, output_field=IntegerField())
+
+    queryset = queryset.annotate(
+        shared_interests=_shared_count(INTERESTS, interest_ids),
+        shared_purposes=_shared_count(PURPOSES, purpose_ids),
+        same_district=flag(district_id=profile.district_id),
+        same_region=flag(region_id=profile.region_id),
+        age_distance=age_distance,
+    )
+    weights = MATCH_SCORE_WEIGHTS
+    return queryset.annotate(score=ExpressionWrapper(
+        Value(weights["shared_interests"]) * F("shared_interests")
+        + Value(weights["shared_purposes"]) * F("shared_purposes")
+        + Value(weights["same_district"]) * F("same_district")
+        + Value(weights["same_region"]) * F("same_region")
+        + Value(weights["age_distance"]) * F("age_distance"),
+        output_field=FloatField(),
+    ))
+
+
+def rank_match_candidates(profile, k, queryset=None):
+    """
+    Eng yuqori balli k ta nomzod: [(profile_id, score), ...]. Hisoblash va saralash
+    to'liq SQL tomonida — Python ga faqat k ta qator keladi.
+    """
+    if queryset is None:
+        queryset = build_match_queryset(profile)
+    ranked = annotate_match_score(queryset, profile).order_by("-score", "id")
+    return [(pid, float(score)) for pid, score in ranked.values_list("id", "score")[:k]]
+
+
+def sample_match_ids(queryset, count, exclude=(), probes=MATCH_RANDOM_PROBES, rounds=MATCH_RANDOM_ROUNDS):
+    """
+    queryset dan `count` tagacha turli tasodifiy profil id lari.
+
+    ORDER BY RANDOM() o'rniga id oralig'idan tasodifiy id lar olinadi va
+    ular bitta indeksli so'rov bilan tekshiriladi; yetmasa yangi id lar bilan
+    `rounds` martagacha qayta urinadi. Nomzodlar siyrak bo'lsa, id o'rniga
+    nomzodlarning tartib raqamlari (ROW_NUMBER, 1..soni) tekshiriladi — har bir
+    tekshiruv nomzodga tushadi. Ikkala bosqichda ham har bir mos profilning
+    tanlanish ehtimoli bir xil. Kam natija qaytishi "nomzod yo'q" degani emas —
+    buni has_match_candidates tekshiradi.
+    """
+    bounds = UserProfile.objects.aggregate(low=Min("id"), high=Max("id"))
+    if bounds["low"] is None or count <= 0:
+        return []
+
+    probes = max(probes, count * 8)
+    id_range = range(bounds["low"], bounds["high"] + 1)
+    if len(id_range) <= probes:
+        # Butun oraliq bitta so'rovga sig'adi — bu to'liq tekshiruv
+        hits = [pid for pid in queryset.filter(id__in=list(id_range)).values_list("id", flat=True) if pid not in exclude]
+        return random.sample(hits, min(count, len(hits)))
+
+    hits = set()
+    for _ in range(rounds):
+        probe_ids = random.sample(id_range, probes)
+        hits.update(
+            pid for pid in queryset.filter(id__in=probe_ids).values_list("id", flat=True)
+            if pid not in exclude
+        )
+        if len(hits) >= count:
+            return random.sample(sorted(hits), count)
+
+    # Nomzodlar siyrak: tasodifiy tartib raqamlari bo'yicha
+    total = queryset.count()
+    if total <= probes:
+        hits.update(pid for pid in queryset.values_list("id", flat=True) if pid not in exclude)
+        return random.sample(sorted(hits), min(count, len(hits)))
+
+    positions = range(1, total + 1)
+    numbered = queryset.annotate(position=Window(RowNumber(), order_by=F("id").asc()))
+    for _ in range(rounds):
+        picked = random.sample(positions, probes)
+        hits.update(
+            pid for pid in numbered.filter(position__in=picked).values_list("id", flat=True)
+            if pid not in exclude
+        )
+        if len(hits) >= count:
+            break
+    return random.sample(sorted(hits), min(count, len(hits)))
+
+
+def has_match_candidates(queryset, exclude=(), chunk=MATCH_SCAN_CHUNK):
+    """
+    queryset da exclude ga kirmagan nomzod bormi. id tartibida bo'laklab o'qiladi va
+    birinchi topilgan nomzodda to'xtaydi; False — haqiqatan ham nomzod qolmagan.
+    """
+    last_id = None
+    while True:
+        page = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        ids = list(page.order_by("id").values_list("id", flat=True)[:chunk])
+        if any(pid not in exclude for pid in ids):
+            return True
+        if len(ids) < chunk:
+            return False
+        last_id = ids[-1]
+
+
+def sample_match_id(queryset, probes=MATCH_RANDOM_PROBES):
+    """sample_match_ids ning bitta natijali ko'rinishi (yoki None)"""
+    ids = sample_match_ids(queryset, 1, probes=probes)
+    return ids[0] if ids else None
+
+
+def refill_match_queue(profile, size=MATCH_QUEUE_SIZE):
+    """
+    Profil navbatini moslik bali bo'yicha saralangan nomzodlar bilan to'ldiradi.
+    Ko'rilgan (SeenProfiles) va bloklangan profillar navbatga kirmaydi — ularning
+    o'rnini to'ldirish uchun ko'proq nomzod olinadi (ko'pi bilan MATCH_QUEUE_MAX_FETCH
+    barobar). Navbat uzunligini qaytaradi.
+    """
+    candidate_ids = []
+    if profile.gender:
+        excluded = Excluding(blocked_profile_ids(profile.id), load_seen(profile))
+        fetch = size * 2
+        while True:
+            ranked = rank_match_candidates(profile, fetch)
+            candidate_ids = [pid for pid, _ in ranked if pid not in excluded][:size]
+            if len(candidate_ids) >= size or len(ranked) < fetch or fetch >= size * MATCH_QUEUE_MAX_FETCH:
+                break
+            fetch *= 2
+        # Navbat oxiridan olinadi — eng yuqori balli nomzod oxirida turadi
+        candidate_ids.reverse()
+
+    MatchQueue.objects.update_or_create(
+        user_profile=profile,
+        defaults={
+            "candidate_ids": candidate_ids,
+            "needs_refill": False,
+            "refilled_at": timezone.now(),
+        },
+    )
+    return len(candidate_ids)
+
+
+def pop_match_candidates(profile, count=1):
+    """
+    Navbatdan `count` tagacha nomzod id sini oladi (navbat bo'sh bo'lsa []).
+    Navbat kamayib qolsa, qayta to'ldirish uchun belgilanadi.
+    """
+    with transaction.atomic():
+        queue = MatchQueue.objects.select_for_update().filter(user_profile=profile).first()
+        if queue is None or not queue.candidate_ids:
+            if queue is not None and not queue.needs_refill:
+                queue.needs_refill = True
+                queue.save(update_fields=["needs_refill"])
+            return []
+
+        candidate_ids = queue.candidate_ids[-count:][::-1]
+        del queue.candidate_ids[-count:]
+        update_fields = ["candidate_ids"]
+        if len(queue.candidate_ids) < MATCH_QUEUE_LOW_WATERMARK and not queue.needs_refill:
+            queue.needs_refill = True
+            update_fields.append("needs_refill")
+        queue.save(update_fields=update_fields)
+        return candidate_ids
+
+
+class Excluding:
+    """Bir nechta to'plam (set, SeenProfiles, ...) birlashmasi uchun `in` tekshiruvi"""
+
+    def __init__(self, *containers):
+        self.containers = containers
+
+    def __contains__(self, item):
+        return any(item in container for container in self.containers)
+
+
+def load_seen(profile):
+    """Profilning "ko'rilganlar" to'plami (hali yo'q bo'lsa saqlanmagan yangi obyekt)"""
+    seen = SeenProfiles.objects.filter(user_profile=profile).first() or SeenProfiles(user_profile=profile)
+    seen.reset_if_needed()
+    return seen
+
+
+def mark_seen(seen, profile_ids):
+    """
+    profile_ids ni ko'rilganlarga qo'shib saqlaydi va saqlangan obyektni qaytaradi.
+    Qator hali yo'q bo'lsa get_or_create — ikki parallel birinchi so'rov IntegrityError bermaydi.
+    """
+    profile_ids = list(profile_ids)
+    if seen._state.adding:
+        seen.add(profile_ids)
+        stored, created = SeenProfiles.objects.get_or_create(
+            user_profile_id=seen.user_profile_id,
+            defaults={"pending_ids": seen.pending_ids, "count": seen.count, "bloom": seen.bloom, "reset_at": seen.reset_at},
+        )
+        if created:
+            return stored
+        seen = stored
+    seen.add(profile_ids)
+    seen.save_changes()
+    return seen
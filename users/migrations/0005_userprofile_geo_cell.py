@@ -0,0 +1,50 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:02
+
+from math import floor
+
+from django.db import migrations, models
+
+# users.models.compute_geo_cell ning shu migratsiya paytidagi nusxasi
+GEO_CELL_SIZE = 0.05
+
+
+def compute_geo_cell(lat, lon):
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    return f"{floor(lat / GEO_CELL_SIZE)}:{floor(lon / GEO_CELL_SIZE)}"
+
+
+def fill_geo_cells(apps, schema_editor):
+    UserProfile = apps.get_model('users', 'UserProfile')
+    profiles = UserProfile.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True)
+    batch = []
+    for profile in profiles.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        profile.geo_cell = compute_geo_cell(profile.latitude, profile.longitude)
+        batch.append(profile)
+        if len(batch) >= 2000:
+            UserProfile.objects.bulk_update(batch, ['geo_cell'])
+            batch = []
+    if batch:
+        UserProfile.objects.bulk_update(batch, ['geo_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_customuser_phone_alter_pendinguser_email_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='geo_cell',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=32, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['latitude', 'longitude'], name='users_userp_latitud_e97435_idx'),
+        ),
+        migrations.RunPython(fill_geo_cells, migrations.RunPython.noop),
+    ]
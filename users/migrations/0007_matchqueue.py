@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_match_queues(apps, schema_editor):
+    UserProfile = apps.get_model('users', 'UserProfile')
+    MatchQueue = apps.get_model('users', 'MatchQueue')
+    profile_ids = UserProfile.objects.values_list('id', flat=True)
+    MatchQueue.objects.bulk_create(
+        (MatchQueue(user_profile_id=pid) for pid in profile_ids.iterator()),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_userprofile_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatchQueue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidate_ids', models.JSONField(blank=True, default=list)),
+                ('needs_refill', models.BooleanField(db_index=True, default=True)),
+                ('refilled_at', models.DateTimeField(blank=True, null=True)),
+                ('user_profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='match_queue', to='users.userprofile')),
+            ],
+        ),
+        migrations.RunPython(create_match_queues, migrations.RunPython.noop),
+    ]
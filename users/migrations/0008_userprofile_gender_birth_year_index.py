@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_matchqueue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['gender', 'birth_year'], name='users_userp_gender_d16e8a_idx'),
+        ),
+    ]
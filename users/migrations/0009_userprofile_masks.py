@@ -0,0 +1,51 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+# users.functions.ids_to_mask ning shu migratsiya paytidagi nusxasi
+MASK_BITS = 63
+
+
+def ids_to_mask(ids):
+    mask = 0
+    for i in ids:
+        if 0 <= i < MASK_BITS:
+            mask |= 1 << i
+    return mask
+
+
+def fill_masks(apps, schema_editor):
+    UserProfile = apps.get_model('users', 'UserProfile')
+    for mask_field, through, id_field in (
+        ('purposes_mask', UserProfile.purposes.through, 'purpose_id'),
+        ('interests_mask', UserProfile.interests.through, 'interest_id'),
+    ):
+        ids_by_profile = {}
+        for profile_id, item_id in through.objects.values_list('userprofile_id', id_field).iterator():
+            ids_by_profile.setdefault(profile_id, []).append(item_id)
+        batch = [
+            UserProfile(id=profile_id, **{mask_field: ids_to_mask(item_ids)})
+            for profile_id, item_ids in ids_by_profile.items()
+        ]
+        UserProfile.objects.bulk_update(batch, [mask_field], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_userprofile_gender_birth_year_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='interests_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='purposes_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_userprofile_masks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeenProfiles',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bloom', models.BinaryField(default=bytes)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('reset_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user_profile', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seen_profiles', to='users.userprofile')),
+            ],
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def copy_requests_and_subscribers(apps, schema_editor):
+    """
+    extension.requests      -> (so'rov yuboruvchi -> extension egasi, pending)
+    extension.subscribers   -> ikkala yo'nalishda accepted
+    """
+    UserProfileExtension = apps.get_model('users', 'UserProfileExtension')
+    Connection = apps.get_model('users', 'Connection')
+    owner_of = dict(UserProfileExtension.objects.values_list('id', 'user_profile_id'))
+
+    statuses = {}
+    requests = UserProfileExtension.requests.through.objects.values_list('userprofileextension_id', 'userprofile_id')
+    for ext_id, sender_id in requests.iterator():
+        statuses.setdefault((sender_id, owner_of[ext_id]), 'pending')
+    subscribers = UserProfileExtension.subscribers.through.objects.values_list('userprofileextension_id', 'userprofile_id')
+    for ext_id, other_id in subscribers.iterator():
+        owner_id = owner_of[ext_id]
+        statuses[(owner_id, other_id)] = 'accepted'
+        statuses[(other_id, owner_id)] = 'accepted'
+
+    Connection.objects.bulk_create(
+        (
+            Connection(from_profile_id=from_id, to_profile_id=to_id, status=status)
+            for (from_id, to_id), status in statuses.items()
+            if from_id != to_id
+        ),
+        batch_size=2000,
+        ignore_conflicts=True,
+    )
+
+
+def restore_requests_and_subscribers(apps, schema_editor):
+    UserProfileExtension = apps.get_model('users', 'UserProfileExtension')
+    Connection = apps.get_model('users', 'Connection')
+    extension_of = dict(UserProfileExtension.objects.values_list('user_profile_id', 'id'))
+    RequestLink = UserProfileExtension.requests.through
+    SubscriberLink = UserProfileExtension.subscribers.through
+
+    request_links, subscriber_links = [], []
+    rows = Connection.objects.values_list('from_profile_id', 'to_profile_id', 'status')
+    for from_id, to_id, status in rows.iterator():
+        if status == 'pending' and to_id in extension_of:
+            request_links.append(RequestLink(userprofileextension_id=extension_of[to_id], userprofile_id=from_id))
+        elif status == 'accepted' and from_id in extension_of:
+            subscriber_links.append(SubscriberLink(userprofileextension_id=extension_of[from_id], userprofile_id=to_id))
+    RequestLink.objects.bulk_create(request_links, batch_size=2000, ignore_conflicts=True)
+    SubscriberLink.objects.bulk_create(subscriber_links, batch_size=2000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_seenprofiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Connection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted')], default='pending', max_length=10)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('from_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_connections', to='users.userprofile')),
+                ('to_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_connections', to='users.userprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['to_profile', 'status', 'created_at', 'id'], name='connection_incoming_idx'), models.Index(fields=['from_profile', 'status', 'created_at', 'id'], name='connection_outgoing_idx')],
+                'constraints': [models.UniqueConstraint(fields=('from_profile', 'to_profile'), name='connection_unique_pair'), models.CheckConstraint(condition=models.Q(('from_profile', models.F('to_profile')), _negated=True), name='connection_not_self')],
+            },
+        ),
+        migrations.RunPython(copy_requests_and_subscribers, restore_requests_and_subscribers),
+    ]
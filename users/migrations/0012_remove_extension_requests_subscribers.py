@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_connection'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='userprofileextension',
+            name='requests',
+        ),
+        migrations.RemoveField(
+            model_name='userprofileextension',
+            name='subscribers',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_remove_extension_requests_subscribers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='claims_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
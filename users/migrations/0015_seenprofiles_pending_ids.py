@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seenprofiles',
+            name='pending_ids',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -4,6 +4,23 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
 from datetime import timedelta
+from math import floor
+
+# Geo-grid katak o'lchami (gradusda). 0.05° ≈ 5.5 km kenglik bo'yicha
+GEO_CELL_SIZE = 0.05
+
+
+def compute_geo_cell(lat, lon):
+    """
+    Koordinatalar tushadigan grid katak kalitini qaytaradi: "lat_idx:lon_idx".
+    Koordinata yo'q yoki noto'g'ri bo'lsa None.
+    """
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    return f"{floor(lat / GEO_CELL_SIZE)}:{floor(lon / GEO_CELL_SIZE)}"
+
 
 class Region(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -132,11 +149,16 @@ class UserProfile(models.Model):
     district = models.ForeignKey(District, on_delete=models.SET_NULL, null=True, blank=True, related_name="profiles")
     latitude = models.FloatField(blank=True, null=True)
     longitude = models.FloatField(blank=True, null=True)
+    # latitude/longitude dan hisoblanadigan grid katak (yaqin atrofdagilarni tez qidirish uchun)
+    geo_cell = models.CharField(max_length=32, blank=True, null=True, db_index=True, editable=False)
     weight = models.FloatField(blank=True,null=True)
     height  = models.FloatField(blank=True,null=True)
 
     purposes = models.ManyToManyField(Purpose, blank=True)
     interests = models.ManyToManyField(Interest, blank=True)
+    # purposes/interests ning bitmask nusxasi (m2m_changed signali orqali yangilanadi)
+    purposes_mask = models.BigIntegerField(default=0, editable=False)
+    interests_mask = models.BigIntegerField(default=0, editable=False)
     
     bio = models.TextField(blank=True, null=True)  # Foydalanuvchi haqida qisqacha ma’lumot
 
@@ -144,8 +166,56 @@ class UserProfile(models.Model):
     instagram_link = models.URLField(blank=True, null=True)
     tiktok_link = models.URLField(blank=True, null=True)
 
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # JWT dagi profil xulosasi (authentication.py) versiyasi — CLAIMS_FIELDS o'zgarsa oshadi
+    claims_version = models.PositiveIntegerField(default=0, editable=False)
+
+    CLAIMS_FIELDS = ('gender', 'birth_year', 'region_id', 'district_id')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude']),
+            models.Index(fields=['gender', 'birth_year']),
+        ]
+
     def __str__(self):
         return f"Profile of {self.user.email}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._claims_snapshot = instance.claims_values()
+        return instance
+
+    def claims_values(self):
+        # __dict__ orqali — defer() qilingan maydonlar uchun so'rov yuborilmaydi
+        return tuple(self.__dict__.get(field) for field in self.CLAIMS_FIELDS)
+
+    def save(self, *args, **kwargs):
+        self.geo_cell = compute_geo_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get("update_fields")
+        extra_fields = set()
+        if {"latitude", "longitude"} & set(update_fields or ()):
+            extra_fields.add("geo_cell")
+
+        snapshot = getattr(self, "_claims_snapshot", None)
+        current = self.claims_values()
+        if snapshot is not None and update_fields is not None:
+            # Faqat saqlanayotgan maydonlar hisobga olinadi
+            saved = set(update_fields)
+            current = tuple(
+                new if field in saved or field.removesuffix("_id") in saved else old
+                for field, old, new in zip(self.CLAIMS_FIELDS, snapshot, current)
+            )
+        self._claims_changed = snapshot is not None and snapshot != current
+        if self._claims_changed:
+            self.claims_version += 1
+            extra_fields.add("claims_version")
+
+        if update_fields is not None and extra_fields:
+            kwargs["update_fields"] = set(update_fields) | extra_fields
+        super().save(*args, **kwargs)
+        self._claims_snapshot = current
     
 
     
@@ -171,15 +241,167 @@ class UserProfileExtension(models.Model):
     requests_left = models.PositiveIntegerField(default=50)
     last_reset = models.DateTimeField(auto_now_add=True)
 
-    subscribers = models.ManyToManyField(UserProfile, related_name='subscribed_to', blank=True)
-    requests = models.ManyToManyField(UserProfile, related_name='requested_profiles', blank=True)
     blocked_users = models.ManyToManyField(UserProfile, related_name='blocked_by', blank=True)
 
     def __str__(self):
         return f"Extension of {self.user_profile.user.email}"
 
-    def reset_requests_if_needed(self):
-        if timezone.now() - self.last_reset >= timedelta(days=1):
-            self.requests_left = self.daily_requests_limit
-            self.last_reset = timezone.now()
-            self.save()
+
+class Connection(models.Model):
+    """
+    Ikki profil orasidagi yo'naltirilgan bog'lanish (zapros / o'zaro obuna).
+    from_profile -> to_profile zapros yuborganda PENDING qator yoziladi;
+    qarshi tomon ham yuborganda ikkala yo'nalish ACCEPTED bo'ladi.
+    """
+    PENDING = 'pending'
+    ACCEPTED = 'accepted'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (ACCEPTED, 'Accepted'),
+    )
+
+    from_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='outgoing_connections')
+    to_profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE, related_name='incoming_connections')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['from_profile', 'to_profile'], name='connection_unique_pair'),
+            models.CheckConstraint(condition=~models.Q(from_profile=models.F('to_profile')), name='connection_not_self'),
+        ]
+        indexes = [
+            # Kiruvchi / chiquvchi ro'yxatlar: (profil, status) bo'yicha created_at, id tartibida
+            models.Index(fields=['to_profile', 'status', 'created_at', 'id'], name='connection_incoming_idx'),
+            models.Index(fields=['from_profile', 'status', 'created_at', 'id'], name='connection_outgoing_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.from_profile_id} -> {self.to_profile_id} ({self.status})"
+
+
+class MatchQueue(models.Model):
+    """
+    Foydalanuvchi uchun oldindan tanlab qo'yilgan nomzodlar navbati.
+    Navbat fon jarayonida (refill_match_queues) to'ldiriladi, MatchUserView esa undan oladi.
+    """
+    user_profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, related_name='match_queue')
+    candidate_ids = models.JSONField(default=list, blank=True)
+    needs_refill = models.BooleanField(default=True, db_index=True)
+    refilled_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Match queue of profile {self.user_profile_id} ({len(self.candidate_ids)})"
+
+
+class SeenProfiles(models.Model):
+    """
+    Foydalanuvchiga ko'rsatilgan profillar (Bloom filter ko'rinishida, hajmi o'zgarmas).
+    SEEN_RESET_DAYS o'tganda yoki SEEN_CAPACITY to'lganda yangi davr boshlanadi.
+    Yangi id lar avval pending_ids ga yoziladi va SEEN_FLUSH_SIZE tadan keyin filtrga
+    o'tkaziladi — har bir swipe da 8 KB lik filtr qayta yozilmaydi.
+    """
+    SEEN_BITS = 65536  # 8 KB
+    SEEN_HASHES = 4
+    SEEN_CAPACITY = 5000
+    SEEN_RESET_DAYS = 7
+    SEEN_FLUSH_SIZE = 32
+
+    user_profile = models.OneToOneField(UserProfile, on_delete=models.CASCADE, related_name='seen_profiles')
+    bloom = models.BinaryField(default=bytes)
+    pending_ids = models.JSONField(default=list)
+    count = models.PositiveIntegerField(default=0)
+    reset_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Seen profiles of {self.user_profile_id} ({self.count})"
+
+    @property
+    def bloom_filter(self):
+        if not hasattr(self, "_bloom_filter"):
+            from .functions import BloomFilter
+            self._bloom_filter = BloomFilter(bytes(self.bloom), self.SEEN_BITS, self.SEEN_HASHES)
+        return self._bloom_filter
+
+    def reset(self):
+        self.bloom = b""
+        self.pending_ids = []
+        self.count = 0
+        self.reset_at = timezone.now()
+        self._bloom_changed = True
+        if hasattr(self, "_bloom_filter"):
+            del self._bloom_filter
+
+    def reset_if_needed(self):
+        if self.count >= self.SEEN_CAPACITY or timezone.now() - self.reset_at >= timedelta(days=self.SEEN_RESET_DAYS):
+            self.reset()
+
+    def __contains__(self, profile_id):
+        return self.count > 0 and (profile_id in self.pending_ids or profile_id in self.bloom_filter)
+
+    def add(self, profile_ids):
+        profile_ids = list(profile_ids)
+        self.pending_ids = self.pending_ids + profile_ids
+        self.count += len(profile_ids)
+        if len(self.pending_ids) >= self.SEEN_FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        """pending_ids ni filtrga o'tkazadi"""
+        for pid in self.pending_ids:
+            self.bloom_filter.add(pid)
+        self.bloom = self.bloom_filter.to_bytes()
+        self.pending_ids = []
+        self._bloom_changed = True
+
+    def save_changes(self):
+        """O'zgargan maydonlarni saqlaydi: filtr faqat flush / reset dan keyin yoziladi"""
+        fields = ["pending_ids", "count"]
+        if getattr(self, "_bloom_changed", False):
+            fields += ["bloom", "reset_at"]
+        self.save(update_fields=fields)
+        self._bloom_changed = False
+
+
+class OutboxMessage(models.Model):
+    """
+    Yuborilishi kerak bo'lgan xabar (OTP kod va h.k.). View faqat navbatga yozadi,
+    deliver_outbox buyrug'i esa timeout va qayta urinishlar bilan yetkazadi.
+    """
+    EMAIL = 'email'
+    TELEGRAM = 'telegram'
+    CHANNEL_CHOICES = (
+        (EMAIL, 'Email'),
+        (TELEGRAM, 'Telegram'),
+    )
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    channel = models.CharField(max_length=16, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=255)  # email yoki Telegram chat_id
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} -> {self.recipient} ({self.status})"
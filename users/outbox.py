@@ -0,0 +1,216 @@
+# users/outbox.py
+#
+# OTP kodlarini yuborish navbati (OutboxMessage).
+# View lar xabarni faqat jadvalga yozadi va darhol javob qaytaradi; SMTP / Telegram
+# ga ulanish deliver_outbox buyrug'ida, timeout, cheklangan parallellik va
+# eksponensial kutish (backoff) bilan bajariladi.
+#
+# Transportlar OUTBOX_TRANSPORTS sozlamasidan olinadi (kanal -> klass yo'li);
+# testlarda FakeTransport ishlatiladi.
+
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection, send_mail
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxMessage
+from .telegram import TelegramResult, telegram_client
+
+DEFAULT_TRANSPORTS = {
+    OutboxMessage.EMAIL: "users.outbox.EmailTransport",
+    OutboxMessage.TELEGRAM: "users.outbox.TelegramTransport",
+}
+
+logger = logging.getLogger(__name__)
+
+# Olingan (claim qilingan) xabar shu vaqt ichida yuborilmasa, boshqa worker uni qayta oladi
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+# ---------- navbatga yozish ----------
+
+def enqueue_email_code(email, code):
+    return OutboxMessage.objects.create(
+        channel=OutboxMessage.EMAIL,
+        recipient=email,
+        subject="Tasdiqlash kodi",
+        body=f"Sizning tasdiqlash kodingiz: {code}",
+    )
+
+
+def enqueue_telegram_code(message, chat_ids=None):
+    if chat_ids is None:
+        chat_ids = [settings.TELEGRAM_USER_ID1]
+    return OutboxMessage.objects.bulk_create([
+        OutboxMessage(channel=OutboxMessage.TELEGRAM, recipient=str(chat_id), body=message)
+        for chat_id in dict.fromkeys(chat_ids)
+    ])
+
+
+# ---------- transportlar ----------
+
+def _error(e):
+    return f"{type(e).__name__}: {e}"
+
+
+class Transport:
+    def send(self, message, timeout):
+        raise NotImplementedError
+
+    def send_batch(self, messages, timeout, pool):
+        """Har bir xabar uchun xato matni yoki None (messages tartibida); standart — pool da bittadan"""
+        def send_one(message):
+            try:
+                self.send(message, timeout)
+            except Exception as e:
+                return _error(e)
+            return None
+
+        return list(pool.map(send_one, messages))
+
+
+class EmailTransport(Transport):
+    def send(self, message, timeout):
+        connection = get_connection(timeout=timeout)
+        send_mail(
+            message.subject, message.body, settings.DEFAULT_FROM_EMAIL, [message.recipient],
+            connection=connection,
+        )
+
+
+class TelegramTransport(Transport):
+    """Bir xil matnli xabarlar telegram_client.send_many orqali (keep-alive pool, parallel) yuboriladi"""
+
+    def send(self, message, timeout):
+        telegram_client.send_message(message.recipient, message.body, timeout=(telegram_client.timeout[0], timeout))
+
+    def send_batch(self, messages, timeout, pool):
+        by_body = {}
+        for message in messages:
+            by_body.setdefault(message.body, []).append(message)
+
+        errors = {}
+        for body, group in by_body.items():
+            try:
+                results = telegram_client.send_many(
+                    [m.recipient for m in group], body, timeout=(telegram_client.timeout[0], timeout),
+                )
+            except Exception as e:
+                results = [TelegramResult(m.recipient, False, 0, _error(e)) for m in group]
+            by_chat = {result.chat_id: result.error for result in results}
+            for message in group:
+                errors[message.id] = by_chat.get(message.recipient)
+        return [errors[message.id] for message in messages]
+
+
+class FakeTransport(Transport):
+    """Testlar uchun: yuborilganlarni sent ga yozadi, fail_times marta xato beradi"""
+    sent = []
+    fail_times = 0
+
+    @classmethod
+    def reset(cls, fail_times=0):
+        cls.sent = []
+        cls.fail_times = fail_times
+
+    def send(self, message, timeout):
+        if FakeTransport.fail_times > 0:
+            FakeTransport.fail_times -= 1
+            raise ConnectionError("fake transport xatosi")
+        FakeTransport.sent.append((message.channel, message.recipient, message.body))
+
+
+def get_transport(channel):
+    transports = getattr(settings, "OUTBOX_TRANSPORTS", None) or DEFAULT_TRANSPORTS
+    return import_string(transports[channel])()
+
+
+# ---------- yetkazish ----------
+
+def backoff_delay(attempts):
+    """attempts-urinishdan keyingi kutish: base * 2^(attempts-1), max bilan cheklangan, +-10% jitter"""
+    base = getattr(settings, "OUTBOX_BACKOFF_SECONDS", 5)
+    cap = getattr(settings, "OUTBOX_BACKOFF_MAX_SECONDS", 600)
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def claim_batch(limit, now=None):
+    """
+    Vaqti kelgan xabarlarni oladi. SELECT ... FOR UPDATE SKIP LOCKED — bir nechta
+    worker bir xil qatorni olmaydi; next_attempt_at CLAIM_LEASE ga suriladi, shuning
+    uchun tranzaksiya tugagach ham boshqa worker ularni yuborish paytida olmaydi.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxMessage.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        if messages:
+            OutboxMessage.objects.filter(id__in=[m.id for m in messages]).update(next_attempt_at=now + CLAIM_LEASE)
+    return messages
+
+
+def record_result(message, error, now=None):
+    now = now or timezone.now()
+    message.attempts += 1
+    if error is None:
+        message.status = OutboxMessage.SENT
+        message.sent_at = now
+        message.last_error = ""
+    else:
+        message.last_error = error[:1000]
+        if message.attempts >= getattr(settings, "OUTBOX_MAX_ATTEMPTS", 6):
+            message.status = OutboxMessage.FAILED
+        else:
+            message.next_attempt_at = now + backoff_delay(message.attempts)
+    if message.status != OutboxMessage.PENDING:
+        # Matnda OTP kod bor — yuborilgandan (yoki voz kechilgandan) keyin saqlanmaydi
+        message.body = ""
+    message.save(update_fields=["status", "attempts", "next_attempt_at", "last_error", "sent_at", "body"])
+
+
+def deliver_pending(batch_size=100, concurrency=None, timeout=None):
+    """
+    Bitta partiyani yuboradi, (yuborildi, xato) sonlarini qaytaradi.
+    Xabarlar kanal bo'yicha transportning send_batch iga beriladi; tarmoq chaqiruvlari
+    pool threadlarida, DB ga yozish — chaqiruvchi threadda.
+    """
+    concurrency = concurrency or getattr(settings, "OUTBOX_CONCURRENCY", 8)
+    timeout = timeout or getattr(settings, "OUTBOX_SEND_TIMEOUT", 10)
+
+    messages = claim_batch(batch_size)
+    if not messages:
+        return 0, 0
+
+    by_channel = {}
+    for message in messages:
+        by_channel.setdefault(message.channel, []).append(message)
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(messages)), thread_name_prefix="outbox") as pool:
+        for channel, group in by_channel.items():
+            try:
+                results = get_transport(channel).send_batch(group, timeout, pool)
+            except Exception as e:
+                results = [_error(e)] * len(group)
+            errors.update((message.id, error) for message, error in zip(group, results))
+
+    sent = failed = 0
+    for message in messages:
+        error = errors[message.id]
+        record_result(message, error)
+        if error is None:
+            sent += 1
+        else:
+            failed += 1
+            logger.warning("Outbox #%s (%s) yuborishda xatolik: %s", message.id, message.channel, error)
+    return sent, failed
@@ -0,0 +1,106 @@
+# users/passwords.py
+#
+# Parol hashlash / tekshirishni cheklangan thread pool da bajarish (async view lar uchun).
+# View (AsyncAPIView) hashni kutayotganda event loop boshqa so'rovlarga xizmat qiladi;
+# PBKDF2 (hashlib), argon2-cffi va bcrypt hisoblash paytida GIL ni qo'yib yuboradi,
+# shuning uchun pool threadlari haqiqatan parallel ishlaydi. Pool hajmi — har bir
+# worker jarayoni uchun; navbat to'lsa PasswordHashBusy (DRF uni 503 + Retry-After
+# javobiga aylantiradi).
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class PasswordHashBusy(APIException):
+    """Hashlash navbati to'la — keyinroq urinib ko'rish kerak."""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Server band, birozdan so'ng qayta urinib ko'ring."
+    default_code = "password_hash_busy"
+    wait = 1
+
+
+class PasswordHashPool:
+    def __init__(self, workers=None, queue_size=None, wait_timeout=None):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.wait_timeout = wait_timeout
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _setting(self, value, name, default):
+        return value if value is not None else getattr(settings, name, default)
+
+    def _ensure_started(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    workers = self._setting(self.workers, "PASSWORD_HASH_WORKERS", None) or os.cpu_count() or 1
+                    queue_size = self._setting(self.queue_size, "PASSWORD_HASH_QUEUE_SIZE", workers * 4)
+                    self._slots = threading.BoundedSemaphore(workers + queue_size)
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _acquire_slot(self):
+        # Event loop ni bloklamaslik uchun semafor kutilmaydi, qisqa oraliqlarda qayta tekshiriladi
+        deadline = time.monotonic() + self._setting(self.wait_timeout, "PASSWORD_HASH_WAIT_SECONDS", 2.0)
+        while not self._slots.acquire(blocking=False):
+            if time.monotonic() >= deadline:
+                raise PasswordHashBusy()
+            await asyncio.sleep(0.01)
+
+    async def run(self, func, *args):
+        executor = self._ensure_started()
+        await self._acquire_slot()
+        try:
+            return await asyncio.wrap_future(executor.submit(func, *args))
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+password_pool = PasswordHashPool()
+
+
+async def ahash_password(raw_password):
+    """make_password — pool da"""
+    return await password_pool.run(make_password, raw_password)
+
+
+async def aset_password(user, raw_password):
+    """user.set_password ning pool dagi varianti (saqlamaydi)"""
+    user.password = await ahash_password(raw_password)
+    user._password = raw_password
+
+
+async def acheck_password(user, raw_password):
+    """
+    user.check_password ning pool dagi varianti. Hash eskirgan bo'lsa (boshqa algoritm
+    yoki cost) parol qayta hashlanadi va saqlanadi. Pool threadlarida faqat hisoblash, DB emas.
+    """
+    encoded = user.password
+    if not await password_pool.run(check_password, raw_password, encoded):
+        return False
+
+    preferred = get_hasher("default")
+    try:
+        current = identify_hasher(encoded)
+    except ValueError:
+        return True
+    if current.algorithm != preferred.algorithm or preferred.must_update(encoded):
+        await aset_password(user, raw_password)
+        await user.asave(update_fields=["password"])
+    return True
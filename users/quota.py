@@ -0,0 +1,69 @@
+# users/quota.py
+#
+# Kunlik so'rovlar limiti (UserProfileExtension.requests_left).
+# Limit bitta shartli UPDATE bilan kamaytiriladi: o'qish-yozish orasida
+# poyga (race) bo'lmaydi va sutkalik yangilanish ham shu so'rov ichida bajariladi.
+# O'qishda qoldiq last_reset dan hisoblanadi — yangilash uchun alohida yozuv kerak emas.
+
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import UserProfileExtension
+
+QUOTA_PERIOD = timedelta(days=1)
+
+
+def remaining_requests(extension, now=None):
+    """Joriy qoldiq (yozmasdan): sutka o'tgan bo'lsa to'liq kunlik limit"""
+    now = now or timezone.now()
+    if now - extension.last_reset >= QUOTA_PERIOD:
+        return extension.daily_requests_limit
+    return extension.requests_left
+
+
+def consume_requests(profile_id, count=1, now=None):
+    """
+    Profil limitidan `count` ta so'rovni atomar ayiradi.
+    Muvaffaqiyatli bo'lsa yangi qoldiqni, limit yetmasa None qaytaradi.
+
+    UPDATE ... SET requests_left = requests_left - n WHERE requests_left >= n
+    ko'rinishida, sutka o'tgan bo'lsa qoldiq daily_requests_limit dan hisoblanadi.
+    """
+    now = now or timezone.now()
+    cutoff = now - QUOTA_PERIOD
+    qn = connection.ops.quote_name
+    table = qn(UserProfileExtension._meta.db_table)
+
+    sql = f"""
+        UPDATE {table}
+        SET {qn("requests_left")} = CASE
+                WHEN {qn("last_reset")} <= %s THEN {qn("daily_requests_limit")} - %s
+                ELSE {qn("requests_left")} - %s
+            END,
+            {qn("last_reset")} = CASE
+                WHEN {qn("last_reset")} <= %s THEN %s
+                ELSE {qn("last_reset")}
+            END
+        WHERE {qn("user_profile_id")} = %s
+          AND (
+                ({qn("last_reset")} > %s AND {qn("requests_left")} >= %s)
+             OR ({qn("last_reset")} <= %s AND {qn("daily_requests_limit")} >= %s)
+          )
+        RETURNING {qn("requests_left")}
+    """
+    field = UserProfileExtension._meta.get_field("last_reset")
+    cutoff_db = field.get_db_prep_value(cutoff, connection)
+    now_db = field.get_db_prep_value(now, connection)
+    params = [
+        cutoff_db, count, count,
+        cutoff_db, now_db,
+        profile_id,
+        cutoff_db, count,
+        cutoff_db, count,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    return row[0] if row else None
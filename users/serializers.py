@@ -1,7 +1,24 @@
 # users/serializers.py
 
 from rest_framework import serializers
+from django.db.models import Prefetch
 from .models import CustomUser,UserImage,Purpose,Interest,UserProfile,UserProfileExtension,Region,District
+from .quota import remaining_requests
+
+
+def main_image_prefetch(prefix=''):
+    """
+    profile.main_images — faqat asosiy rasm(lar), bitta qo'shimcha so'rov bilan.
+    prefix bog'langan profil uchun, masalan 'from_profile__'.
+    """
+    return Prefetch(f'{prefix}images', queryset=UserImage.objects.filter(is_main=True), to_attr='main_images')
+
+
+def get_main_image(profile):
+    main_images = getattr(profile, 'main_images', None)
+    if main_images is None:
+        return profile.images.filter(is_main=True).first()
+    return main_images[0] if main_images else None
 
 
 
@@ -48,10 +65,15 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['name']
 
 class UserProfileExtensionSerializer(serializers.ModelSerializer):
+    requests_left = serializers.SerializerMethodField()
+
     class Meta:
         model = UserProfileExtension
         fields = ['daily_requests_limit', 'requests_left', 'last_reset']
 
+    def get_requests_left(self, obj):
+        return remaining_requests(obj)
+
 class FullUserProfileSerializer(serializers.ModelSerializer):
     user = UserSerializer()
     purposes = PurposeSerializer(many=True)
@@ -139,8 +161,15 @@ class MatchedUserSerializer(serializers.ModelSerializer):
             "interests",
         ]
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Serializer uchun kerakli bog'lanishlarni oldindan yuklaydi (N+1 so'rovlarsiz)"""
+        return queryset.select_related('region', 'district').prefetch_related(
+            main_image_prefetch(), 'purposes', 'interests'
+        )
+
     def get_image(self, obj):
-        main_image = obj.images.filter(is_main=True).first()
+        main_image = get_main_image(obj)
         return main_image.image.url if main_image else None
 
     def get_region(self, obj):
@@ -1,8 +1,136 @@
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import UserProfile, UserProfileExtension
+from .models import CustomUser, UserProfile, UserProfileExtension, MatchQueue
+from .authentication import invalidate_claims_version, invalidate_user_token
+from .spatial_index import profile_index
+from .functions import ids_to_mask, invalidate_block_cache
 
 @receiver(post_save, sender=UserProfile)
 def create_profile_extension(sender, instance, created, **kwargs):
     if created:
         UserProfileExtension.objects.create(user_profile=instance)
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_match_queue(sender, instance, created, **kwargs):
+    if created:
+        MatchQueue.objects.create(user_profile=instance)
+    else:
+        MatchQueue.objects.filter(user_profile=instance, needs_refill=False).update(needs_refill=True)
+
+
+@receiver(m2m_changed, sender=UserProfile.purposes.through)
+@receiver(m2m_changed, sender=UserProfile.interests.through)
+def invalidate_match_queue_on_m2m(sender, instance, action, reverse, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear") and not reverse:
+        MatchQueue.objects.filter(user_profile=instance, needs_refill=False).update(needs_refill=True)
+
+
+@receiver(post_save, sender=UserProfile)
+def mark_spatial_index_dirty(sender, instance, **kwargs):
+    profile_index.mark_dirty()
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_from_spatial_index(sender, instance, **kwargs):
+    profile_index.mark_deleted(instance.id)
+
+
+MASK_FIELDS = {
+    UserProfile.purposes.through: ("purposes_mask", "purpose_id"),
+    UserProfile.interests.through: ("interests_mask", "interest_id"),
+}
+
+
+def sync_profile_masks(through, profile_ids):
+    """Profillar maskasini through jadvaldan qayta hisoblaydi: {profile_id: mask}"""
+    mask_field, id_field = MASK_FIELDS[through]
+    ids_by_profile = {pid: [] for pid in profile_ids}
+    rows = through.objects.filter(userprofile_id__in=profile_ids).values_list("userprofile_id", id_field)
+    for profile_id, item_id in rows:
+        ids_by_profile[profile_id].append(item_id)
+    masks = {pid: ids_to_mask(item_ids) for pid, item_ids in ids_by_profile.items()}
+    for profile_id, mask in masks.items():
+        UserProfile.objects.filter(id=profile_id).update(**{mask_field: mask})
+    return masks
+
+
+@receiver(m2m_changed, sender=UserProfile.purposes.through)
+@receiver(m2m_changed, sender=UserProfile.interests.through)
+def update_profile_masks(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear" and reverse:
+        # Interest/Purpose tomonidan clear(): qaysi profillar ta'sirlanishini oldindan eslab qolamiz
+        instance._mask_profile_ids = list(
+            sender.objects.filter(**{MASK_FIELDS[sender][1]: instance.pk}).values_list("userprofile_id", flat=True)
+        )
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if not reverse:
+        profile_ids = [instance.pk]
+    elif action == "post_clear":
+        profile_ids = getattr(instance, "_mask_profile_ids", [])
+    else:
+        profile_ids = list(pk_set or [])
+    if not profile_ids:
+        return
+    masks = sync_profile_masks(sender, profile_ids)
+    if not reverse:
+        # keyingi instance.save() eski qiymatni yozib yubormasligi uchun
+        setattr(instance, MASK_FIELDS[sender][0], masks[instance.pk])
+
+
+@receiver(m2m_changed, sender=UserProfileExtension.blocked_users.through)
+def invalidate_block_sets(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # clear() da pk_set bo'lmaydi — ta'sirlanadigan profillarni oldindan eslab qolamiz
+        if reverse:
+            instance._block_related_ids = list(instance.blocked_by.values_list("user_profile_id", flat=True))
+        else:
+            instance._block_related_ids = list(instance.blocked_users.values_list("id", flat=True))
+        return
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if action == "post_clear":
+        related_ids = getattr(instance, "_block_related_ids", [])
+    elif reverse:
+        # instance — bloklangan UserProfile, pk_set — UserProfileExtension id lari
+        related_ids = list(UserProfileExtension.objects.filter(pk__in=pk_set).values_list("user_profile_id", flat=True))
+    else:
+        related_ids = list(pk_set)
+
+    owner_id = instance.pk if reverse else instance.user_profile_id
+    invalidate_block_cache([owner_id, *related_ids])
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_user_token(sender, instance, **kwargs):
+    # __dict__ orqali — only()/defer() bilan yuklanganda qo'shimcha so'rov bo'lmasligi uchun
+    instance._auth_state = (instance.__dict__.get("token"), instance.__dict__.get("is_active"))
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_token_cache(sender, instance, created, **kwargs):
+    old_token, old_active = getattr(instance, "_auth_state", (None, None))
+    # Keshda butun foydalanuvchi maydonlari turadi — har qanday saqlashda eskiradi
+    invalidate_user_token(old_token)
+    invalidate_user_token(instance.token)
+    if not created and (old_token != instance.token or old_active != instance.is_active):
+        # JWT dagi xulosada token bor; bloklangan foydalanuvchi ham DB orqali tekshirilishi kerak
+        UserProfile.objects.filter(user=instance).update(claims_version=F("claims_version") + 1)
+        invalidate_claims_version(instance.pk)
+    instance._auth_state = (instance.token, instance.is_active)
+
+
+@receiver(post_delete, sender=CustomUser)
+def remove_user_token_cache(sender, instance, **kwargs):
+    invalidate_user_token(instance.__dict__.get("token"))
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_claims(sender, instance, **kwargs):
+    if getattr(instance, "_claims_changed", False):
+        invalidate_claims_version(instance.user_id)
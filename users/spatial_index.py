@@ -0,0 +1,197 @@
+# users/spatial_index.py
+#
+# Har bir worker xotirasida profil koordinatalarining ixcham indeksi.
+# Massivlar kenglik (latitude) bo'yicha tartiblangan: radius so'rovi avval
+# searchsorted bilan kenglik polosasini ajratadi, keyin shu polosa ichida
+# NumPy bilan aniq masofa hisoblanadi.
+
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+
+from .functions import bounding_box, haversine_distances, nearest_first
+
+GENDER_CODES = {"male": 1, "female": 2}
+
+# updated_at bo'yicha o'qishda kechikib commit bo'lgan yozuvlarni o'tkazib yubormaslik uchun
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+_EMPTY = (
+    np.empty(0, dtype=np.int64),    # id
+    np.empty(0, dtype=np.float64),  # latitude
+    np.empty(0, dtype=np.float64),  # longitude
+    np.empty(0, dtype=np.int8),     # gender (GENDER_CODES, 0 - noma'lum)
+    np.empty(0, dtype=np.int32),    # birth_year (0 - noma'lum)
+)
+
+
+class ProfileSpatialIndex:
+    """
+    (profile id, lat, lon, gender, birth_year) massivlari ustidagi indeks.
+
+    Birinchi so'rovda to'liq quriladi, keyin UserProfile.updated_at bo'yicha
+    faqat o'zgargan qatorlar o'qiladi. O'chirilgan profillar shu workerda
+    post_delete signali orqali, boshqa workerlarda esa davriy to'liq qayta
+    qurishda chiqib ketadi.
+    """
+
+    def __init__(self, refresh_interval=None, rebuild_interval=None):
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._data = _EMPTY
+        self._high_water = None
+        self._built_at = None
+        self._refreshed_at = None
+        self._dirty = False
+        self._deleted = set()
+
+    # ---------- holat ----------
+
+    def __len__(self):
+        return len(self._data[0])
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def mark_deleted(self, profile_id):
+        self._deleted.add(profile_id)
+        self._dirty = True
+
+    def ensure_fresh(self):
+        refresh_interval = self.refresh_interval
+        if refresh_interval is None:
+            refresh_interval = getattr(settings, "PROFILE_INDEX_REFRESH_SECONDS", 5)
+        rebuild_interval = self.rebuild_interval
+        if rebuild_interval is None:
+            rebuild_interval = getattr(settings, "PROFILE_INDEX_REBUILD_SECONDS", 600)
+
+        # Indeks qurilgan bo'lsa, boshqa thread yangilayotgan paytda eski snapshot bilan ishlaymiz
+        if not self._lock.acquire(blocking=self._built_at is None):
+            return
+        try:
+            now = time.monotonic()
+            if self._built_at is None or now - self._built_at >= rebuild_interval:
+                self._rebuild()
+            elif self._dirty or now - self._refreshed_at >= refresh_interval:
+                self._refresh()
+        finally:
+            self._lock.release()
+
+    # ---------- yuklash ----------
+
+    @staticmethod
+    def _rows_queryset():
+        from .models import UserProfile
+
+        return UserProfile.objects.values_list(
+            "id", "latitude", "longitude", "gender", "birth_year", "updated_at"
+        )
+
+    @staticmethod
+    def _to_arrays(rows):
+        rows = [r for r in rows if r[1] is not None and r[2] is not None]
+        if not rows:
+            return _EMPTY
+        ids, lats, lons, genders, birth_years, _ = zip(*rows)
+        return (
+            np.fromiter(ids, dtype=np.int64, count=len(rows)),
+            np.fromiter(lats, dtype=np.float64, count=len(rows)),
+            np.fromiter(lons, dtype=np.float64, count=len(rows)),
+            np.fromiter((GENDER_CODES.get(g, 0) for g in genders), dtype=np.int8, count=len(rows)),
+            np.fromiter((b or 0 for b in birth_years), dtype=np.int32, count=len(rows)),
+        )
+
+    @staticmethod
+    def _sorted(data):
+        order = np.argsort(data[1], kind="stable")
+        return tuple(column[order] for column in data)
+
+    @staticmethod
+    def _max_updated_at(rows, current=None):
+        stamps = [r[5] for r in rows if r[5] is not None]
+        if current is not None:
+            stamps.append(current)
+        return max(stamps) if stamps else None
+
+    def rebuild(self):
+        with self._lock:
+            self._rebuild()
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _rebuild(self):
+        self._dirty = False
+        self._deleted.clear()
+        rows = list(self._rows_queryset())
+        self._data = self._sorted(self._to_arrays(rows))
+        self._high_water = self._max_updated_at(rows)
+        self._built_at = self._refreshed_at = time.monotonic()
+
+    def _refresh(self):
+        self._dirty = False
+        deleted, self._deleted = self._deleted, set()
+        queryset = self._rows_queryset()
+        if self._high_water is not None:
+            queryset = queryset.filter(updated_at__gte=self._high_water - REFRESH_OVERLAP)
+        rows = list(queryset)
+
+        removed = {r[0] for r in rows} | deleted
+
+        data = self._data
+        if removed:
+            keep = ~np.isin(data[0], np.fromiter(removed, dtype=np.int64, count=len(removed)))
+            data = tuple(column[keep] for column in data)
+        fresh = self._to_arrays(rows)
+        if len(fresh[0]):
+            data = self._sorted(tuple(np.concatenate(pair) for pair in zip(data, fresh)))
+
+        self._data = data
+        self._high_water = self._max_updated_at(rows, self._high_water)
+        self._refreshed_at = time.monotonic()
+
+    # ---------- so'rovlar ----------
+
+    def radius(self, lat, lon, radius_km, gender=None, min_birth_year=None, max_birth_year=None,
+               limit=None, after=None):
+        """
+        radius_km ichidagi profillar: (ids, distances), masofa bo'yicha o'sish tartibida.
+        limit/after berilsa faqat (masofa, id) bo'yicha after dan keyingi limit tasi qaytadi.
+        """
+        ids, lats, lons, genders, birth_years = self._data
+
+        min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+        start = np.searchsorted(lats, min_lat, side="left")
+        stop = np.searchsorted(lats, max_lat, side="right")
+
+        band = slice(start, stop)
+        mask = (lons[band] >= min_lon) & (lons[band] <= max_lon)
+        if gender is not None:
+            mask &= genders[band] == GENDER_CODES.get(gender, 0)
+        if min_birth_year is not None:
+            mask &= birth_years[band] >= min_birth_year
+        if max_birth_year is not None:
+            mask &= (birth_years[band] <= max_birth_year) & (birth_years[band] > 0)
+
+        candidate_ids = ids[band][mask]
+        distances, within = haversine_distances(lat, lon, lats[band][mask], lons[band][mask], radius_km)
+        return nearest_first(candidate_ids[within], distances[within], limit, after)
+
+    def nearest(self, lat, lon, k, **filters):
+        """
+        Eng yaqin k ta profil: (ids, distances). Radius topilguncha ikki barobar kengaytiriladi.
+        """
+        radius_km = 5.0
+        while True:
+            ids, distances = self.radius(lat, lon, radius_km, limit=k, **filters)
+            if len(ids) >= k or radius_km >= 20000:
+                return ids, distances
+            radius_km *= 2
+
+
+profile_index = ProfileSpatialIndex()
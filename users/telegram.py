@@ -0,0 +1,137 @@
+# users/telegram.py
+#
+# Telegram Bot API klienti: bitta requests.Session (keep-alive ulanishlar puli),
+# (connect, read) timeoutlar va bir nechta chat_id ga parallel yuborish.
+# Har bir chaqiruv davomiyligi metrics da yig'iladi (telegram_client.metrics.snapshot()).
+#
+# base_url ni almashtirib lokal stub serverga qarshi test qilish mumkin.
+
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+TelegramResult = namedtuple("TelegramResult", "chat_id ok elapsed error")
+
+
+class TelegramMetrics:
+    """Chaqiruvlar soni, xatolar va oxirgi `window` ta chaqiruv davomiyligi (soniya)"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+
+    def record(self, elapsed, ok):
+        with self._lock:
+            self.calls += 1
+            self.errors += 0 if ok else 1
+            self._latencies.append(elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            calls, errors = self.calls, self.errors
+        if not latencies:
+            return {"calls": calls, "errors": errors, "avg": None, "p50": None, "p95": None, "max": None}
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+        return {
+            "calls": calls,
+            "errors": errors,
+            "avg": sum(latencies) / len(latencies),
+            "p50": percentile(0.5),
+            "p95": percentile(0.95),
+            "max": latencies[-1],
+        }
+
+
+class TelegramClient:
+    def __init__(self, token=None, base_url=None, connect_timeout=None, read_timeout=None, pool_size=None):
+        self.token = token
+        self.base_url = base_url
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = pool_size
+        self.metrics = TelegramMetrics()
+        self._session = None
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _setting(self, value, name, default):
+        return value if value is not None else getattr(settings, name, default)
+
+    @property
+    def timeout(self):
+        return (
+            self._setting(self.connect_timeout, "TELEGRAM_CONNECT_TIMEOUT", 3.05),
+            self._setting(self.read_timeout, "TELEGRAM_READ_TIMEOUT", 10.0),
+        )
+
+    def _ensure_started(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    pool_size = self._setting(self.pool_size, "TELEGRAM_POOL_SIZE", 10)
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="telegram")
+                    self._session = session
+        return self._session
+
+    def url(self, method):
+        base_url = self._setting(self.base_url, "TELEGRAM_API_URL", "https://api.telegram.org").rstrip("/")
+        token = self._setting(self.token, "TELEGRAM_BOT_TOKEN", "")
+        return f"{base_url}/bot{token}/{method}"
+
+    def send_message(self, chat_id, text, timeout=None):
+        """Bitta xabar; HTTP xato yoki timeout da requests istisnosi ko'tariladi"""
+        session = self._ensure_started()
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = session.post(
+                self.url("sendMessage"), json={"chat_id": chat_id, "text": text}, timeout=timeout or self.timeout,
+            )
+            response.raise_for_status()
+            ok = True
+            return response.json()
+        finally:
+            self.metrics.record(time.perf_counter() - start, ok)
+
+    def _send_one(self, chat_id, text, timeout):
+        start = time.perf_counter()
+        try:
+            self.send_message(chat_id, text, timeout)
+        except requests.RequestException as e:
+            return TelegramResult(chat_id, False, time.perf_counter() - start, str(e))
+        return TelegramResult(chat_id, True, time.perf_counter() - start, None)
+
+    def send_many(self, chat_ids, text, timeout=None):
+        """Bir xil xabarni har bir chat_id ga parallel yuboradi; TelegramResult lar ro'yxati (chat_ids tartibida)"""
+        chat_ids = list(dict.fromkeys(chat_ids))
+        self._ensure_started()
+        if len(chat_ids) == 1:
+            return [self._send_one(chat_ids[0], text, timeout)]
+        return list(self._executor.map(lambda chat_id: self._send_one(chat_id, text, timeout), chat_ids))
+
+    def close(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+telegram_client = TelegramClient()
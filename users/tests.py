@@ -1,3 +1,1161 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from math import asin, atan2, cos, degrees, radians, sin
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .functions import BloomFilter, blocked_profile_ids, bounding_box, encode_cursor, geo_cells_for_bbox, haversine_distance, haversine_distances, nearby_profiles_queryset, ids_to_mask, mask_jaccard, mask_jaccards, mask_overlap, mask_overlaps
+from .matching import has_match_candidates, load_seen, mark_seen, rank_match_candidates, refill_match_queue, sample_match_id, sample_match_ids
+from .models import compute_geo_cell, Connection, CustomUser, Interest, MatchQueue, OutboxMessage, Purpose, SeenProfiles, UserImage, UserProfile, UserProfileExtension
+from .authentication import ProfileClaimsAuthentication, ProfileClaimsUser, UserTokenAuthentication, add_profile_claims, user_id_for_token, user_token_cache_key
+from .connections import send_request
+from .outbox import FakeTransport, deliver_pending
+from .passwords import PasswordHashBusy, PasswordHashPool
+from .quota import consume_requests, remaining_requests
+from .throttling import OTPRateThrottle, TokenBucket
+from .spatial_index import profile_index
+from .telegram import TelegramClient
+
+
+def make_profile(email, **fields):
+    user = CustomUser.objects.create(email=email, name=email.split("@")[0])
+    return UserProfile.objects.create(user=user, **fields)
+
+
+class QueryCountTests(TestCase):
+    """Natijalar soni qancha bo'lmasin, so'rovlar soni o'zgarmasligi kerak."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.purpose = Purpose.objects.create(title="Oila")
+        cls.interest = Interest.objects.create(title="Sport")
+        cls.me = make_profile(
+            "me@test.uz", gender="male", birth_year=1990, latitude=41.30, longitude=69.25
+        )
+        cls.me.purposes.set([cls.purpose])
+        cls.me.interests.set([cls.interest])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def add_candidates(self, count):
+        for i in range(count):
+            profile = make_profile(
+                f"c{UserProfile.objects.count()}@test.uz",
+                gender="female", birth_year=1995, latitude=41.30 + i * 0.001, longitude=69.25,
+            )
+            profile.purposes.set([self.purpose])
+            profile.interests.set([self.interest])
+            UserImage.objects.create(user_profile=profile, image="user_images/main.jpg", is_main=True)
+            UserImage.objects.create(user_profile=profile, image="user_images/other.jpg")
+
+    def count_queries(self, url):
+        profile_index.rebuild()
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_nearby_query_count_is_constant(self):
+        url = "/api/v3/search/bylatlong/?lat=41.30&lon=69.25&limit=50"
+        self.add_candidates(2)
+        few, data = self.count_queries(url)
+        self.assertEqual(len(data["nearby_profiles"]), 3)
+
+        self.add_candidates(10)
+        many, data = self.count_queries(url)
+        self.assertEqual(len(data["nearby_profiles"]), 13)
+        self.assertEqual(few, many)
+        self.assertTrue(all(p["image"] for p in data["nearby_profiles"] if p["id"] != self.me.id))
+
+    def test_matched_user_serializer_query_count_is_constant(self):
+        from .serializers import MatchedUserSerializer
+
+        self.add_candidates(2)
+        queryset = UserProfile.objects.exclude(id=self.me.id)
+        with CaptureQueriesContext(connection) as few:
+            MatchedUserSerializer(MatchedUserSerializer.setup_eager_loading(queryset), many=True).data
+
+        self.add_candidates(10)
+        with CaptureQueriesContext(connection) as many:
+            data = MatchedUserSerializer(MatchedUserSerializer.setup_eager_loading(queryset), many=True).data
+
+        self.assertEqual(len(data), 12)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertEqual(data[0]["purposes"], ["Oila"])
+        self.assertEqual(data[0]["interests"], ["Sport"])
+        self.assertTrue(data[0]["image"].endswith("main.jpg"))
+
+    def test_match_view_serializes_with_fixed_queries(self):
+        self.add_candidates(3)
+        mark_seen(load_seen(self.me), [])  # SeenProfiles qatori birinchi so'rovda bir marta yaratiladi
+        first, data = self.count_queries("/api/v3/search/byprofile/")
+        self.assertIsNotNone(data["matched_user"]["image"])
+
+        self.add_candidates(10)
+        second, _ = self.count_queries("/api/v3/search/byprofile/")
+        self.assertEqual(first, second)
+
+
+class GeoCellTests(TestCase):
+    center = (41.30, 69.25)
+
+    def nearby_ids(self, radius_km):
+        queryset = nearby_profiles_queryset(UserProfile.objects.all(), *self.center, radius_km)
+        return set(queryset.values_list("id", flat=True))
+
+    def test_geo_cell_follows_coordinates(self):
+        profile = make_profile("cell@test.uz", latitude=41.30, longitude=69.25)
+        self.assertEqual(UserProfile.objects.get(id=profile.id).geo_cell, compute_geo_cell(41.30, 69.25))
+
+        profile.latitude = 40.10
+        profile.save(update_fields=["latitude"])
+        self.assertEqual(UserProfile.objects.get(id=profile.id).geo_cell, compute_geo_cell(40.10, 69.25))
+
+        profile.latitude = profile.longitude = None
+        profile.save()
+        self.assertIsNone(UserProfile.objects.get(id=profile.id).geo_cell)
+
+    def test_prefilter_keeps_profiles_on_the_radius_edge(self):
+        radius = 10
+        lat, lon = self.center
+        edge = []
+        # Shimol, sharq, janubi-g'arb va shimoli-sharq yo'nalishlarida radiusdan 10 m ichkarida
+        for bearing in (0, 90, 225, 45):
+            d, b, phi = (radius - 0.01) / 6371.0, radians(bearing), radians(lat)
+            lat2 = asin(sin(phi) * cos(d) + cos(phi) * sin(d) * cos(b))
+            lon2 = radians(lon) + atan2(sin(b) * sin(d) * cos(phi), cos(d) - sin(phi) * sin(lat2))
+            point = (degrees(lat2), degrees(lon2))
+            self.assertLessEqual(haversine_distance(lat, lon, *point), radius)
+            edge.append(make_profile(f"edge{bearing}@test.uz", latitude=point[0], longitude=point[1]).id)
+        outside = make_profile("outside@test.uz", latitude=lat + 0.1, longitude=lon).id
+
+        self.assertIsNotNone(geo_cells_for_bbox(*bounding_box(lat, lon, radius)))
+        ids = self.nearby_ids(radius)
+        self.assertTrue(set(edge) <= ids)
+        self.assertNotIn(outside, ids)
+
+    def test_falls_back_to_bbox_when_too_many_cells(self):
+        near = make_profile("near@test.uz", latitude=41.30, longitude=69.25).id
+        far = make_profile("far@test.uz", latitude=39.65, longitude=66.96).id  # ~270 km
+        radius = 300
+        self.assertIsNone(geo_cells_for_bbox(*bounding_box(*self.center, radius)))
+
+        queryset = nearby_profiles_queryset(UserProfile.objects.all(), *self.center, radius)
+        self.assertNotIn("geo_cell", str(queryset.query).split("WHERE")[1])
+        self.assertEqual(set(queryset.values_list("id", flat=True)), {near, far})
+
+        with mock.patch("users.functions.MAX_GEO_CELLS", 100_000):
+            queryset = nearby_profiles_queryset(UserProfile.objects.all(), *self.center, radius)
+        self.assertIn("geo_cell", str(queryset.query).split("WHERE")[1])
+        self.assertEqual(set(queryset.values_list("id", flat=True)), {near, far})
+
+
+class HaversineTests(TestCase):
+    points = [(41.30, 69.25), (41.31, 69.26), (39.65, 66.96), (-33.87, 151.21), (41.30, 69.25), (89.9, -179.9)]
+
+    def test_vectorised_matches_scalar(self):
+        lats, lons = zip(*self.points)
+        distances, mask = haversine_distances(41.30, 69.25, lats, lons)
+        expected = [haversine_distance(41.30, 69.25, lat, lon) for lat, lon in self.points]
+        for got, want in zip(distances.tolist(), expected):
+            self.assertAlmostEqual(got, want, places=6)
+        self.assertTrue(mask.all())
+
+    def test_radius_mask(self):
+        lats, lons = zip(*self.points)
+        distances, mask = haversine_distances(41.30, 69.25, lats, lons, radius_km=300)
+        self.assertEqual(mask.tolist(), [d <= 300 for d in distances.tolist()])
+        self.assertEqual(mask.tolist(), [True, True, True, False, True, False])
+
+        _, mask = haversine_distances(41.30, 69.25, [], [], radius_km=5)
+        self.assertEqual(mask.shape, (0,))
+
+
+class ProfileSpatialIndexRefreshTests(TestCase):
+    def setUp(self):
+        self.near = make_profile("near@test.uz", latitude=41.30, longitude=69.25)
+        self.moving = make_profile("moving@test.uz", latitude=41.30, longitude=69.26)
+        self.doomed = make_profile("doomed@test.uz", latitude=41.31, longitude=69.25)
+        profile_index.rebuild()
+
+    def ids_near(self, lat, lon):
+        ids, _ = profile_index.radius(lat, lon, 5)
+        return set(ids.tolist())
+
+    @override_settings(PROFILE_INDEX_REBUILD_SECONDS=3600)
+    def test_refresh_picks_up_moved_new_and_deleted_profiles(self):
+        self.assertEqual(self.ids_near(41.30, 69.25), {self.near.id, self.moving.id, self.doomed.id})
+
+        self.moving.latitude, self.moving.longitude = 40.10, 65.40
+        self.moving.save()
+        new = make_profile("new@test.uz", latitude=41.305, longitude=69.255)
+        self.doomed.delete()
+
+        with mock.patch.object(profile_index, "_rebuild", side_effect=AssertionError("to'liq qayta qurilmasligi kerak")):
+            profile_index.ensure_fresh()
+        self.assertEqual(self.ids_near(41.30, 69.25), {self.near.id, new.id})
+        self.assertEqual(self.ids_near(40.10, 65.40), {self.moving.id})
+        self.assertEqual(len(profile_index), 3)
+
+    def test_refresh_reads_changes_from_other_workers_by_updated_at(self):
+        # Boshqa workerdagi o'zgarish: bu workerda signal yo'q, faqat updated_at
+        UserProfile.objects.filter(id=self.moving.id).update(
+            latitude=40.10, longitude=65.40, updated_at=timezone.now() + timedelta(seconds=1),
+        )
+        profile_index.refresh()
+        self.assertNotIn(self.moving.id, self.ids_near(41.30, 69.25))
+        self.assertEqual(self.ids_near(40.10, 65.40), {self.moving.id})
+
+
+class ProfileSpatialIndexNearestTests(TestCase):
+    def setUp(self):
+        # (41.30, 69.25) dan shimolga 1, 2, 3, 8 va 30 km
+        self.by_distance = [
+            make_profile(f"k{km}@test.uz", latitude=41.30 + km / 111.195, longitude=69.25, gender="female").id
+            for km in (3, 30, 1, 8, 2)
+        ]
+        self.by_distance = [self.by_distance[i] for i in (2, 4, 0, 3, 1)]
+        self.male = make_profile("male@test.uz", latitude=41.30, longitude=69.25, gender="male").id
+        profile_index.rebuild()
+
+    def test_nearest_returns_k_closest_in_order(self):
+        ids, distances = profile_index.nearest(41.30, 69.25, 3, gender="female")
+        self.assertEqual(ids.tolist(), self.by_distance[:3])
+        self.assertEqual([round(d) for d in distances.tolist()], [1, 2, 3])
+
+        # 5 km dan tashqarida ham — radius kengaytiriladi
+        ids, distances = profile_index.nearest(41.30, 69.25, 5, gender="female")
+        self.assertEqual(ids.tolist(), self.by_distance)
+        self.assertAlmostEqual(distances[-1], 30, places=3)
+
+    def test_nearest_returns_all_when_fewer_than_k(self):
+        ids, _ = profile_index.nearest(41.30, 69.25, 10)
+        self.assertEqual(ids.tolist(), [self.male] + self.by_distance)
+
+
+class NearbyCursorTests(TestCase):
+    url = "/api/v3/search/bylatlong/?lat=41.30&lon=69.25&radius=20"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.me = make_profile("cur@test.uz", latitude=41.30, longitude=69.25)
+        for i in range(12):
+            make_profile(f"n{i}@test.uz", latitude=41.30 + (i // 3) * 0.01, longitude=69.25)  # uchtadan bir xil masofada
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def pages(self, limit):
+        ids, cursor = [], None
+        while True:
+            url = f"{self.url}&limit={limit}" + (f"&cursor={cursor}" if cursor else "")
+            data = self.client.get(url, HTTP_HOST="localhost").json()
+            self.assertLessEqual(len(data["nearby_profiles"]), limit)
+            ids += [p["id"] for p in data["nearby_profiles"]]
+            cursor = data["next"]
+            if cursor is None:
+                return ids
+
+    def all_at_once(self):
+        data = self.client.get(f"{self.url}&limit=100", HTTP_HOST="localhost").json()
+        self.assertIsNone(data["next"])
+        return [p["id"] for p in data["nearby_profiles"]]
+
+    def test_pages_have_no_duplicates_or_gaps(self):
+        profile_index.rebuild()
+        expected = self.all_at_once()
+        self.assertEqual(len(expected), 13)
+        for limit in (1, 2, 4, 5):
+            self.assertEqual(self.pages(limit), expected)
+
+    def test_index_and_database_paths_agree(self):
+        profile_index.rebuild()
+        with override_settings(PROFILE_INDEX_ENABLED=True):
+            from_index = self.pages(4)
+        with override_settings(PROFILE_INDEX_ENABLED=False):
+            from_db = self.pages(4)
+            self.assertEqual(self.all_at_once(), from_db)
+        self.assertEqual(from_index, from_db)
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ("%%%", encode_cursor({"a": 1}), encode_cursor(["x", "y"]), encode_cursor([1.0])):
+            response = self.client.get(f"{self.url}&cursor={cursor}", HTTP_HOST="localhost")
+            self.assertEqual(response.status_code, 400, cursor)
+
+
+class SampleMatchIdTests(TestCase):
+    def test_samples_only_eligible_profiles_uniformly(self):
+        profiles = [make_profile(f"s{i}@test.uz", gender="female" if i % 3 else "male") for i in range(30)]
+        eligible = {p.id for p in profiles if p.gender == "female"}
+        queryset = UserProfile.objects.filter(gender="female")
+
+        counts = Counter(sample_match_id(queryset, probes=8) for _ in range(4000))
+        self.assertEqual(set(counts), eligible)
+        expected = 4000 / len(eligible)
+        self.assertTrue(all(0.5 * expected < c < 1.5 * expected for c in counts.values()))
+
+    def test_returns_none_without_candidates(self):
+        make_profile("only@test.uz", gender="male")
+        self.assertIsNone(sample_match_id(UserProfile.objects.filter(gender="female")))
+
+    def test_sparse_candidates_are_sampled_uniformly(self):
+        profiles = [make_profile(f"sp{i}@test.uz", gender="male") for i in range(60)]
+        rare = [profiles[7].id, profiles[8].id, profiles[41].id]
+        UserProfile.objects.filter(id__in=rare).update(gender="female")
+        queryset = UserProfile.objects.filter(gender="female")
+
+        with CaptureQueriesContext(connection) as queries:
+            ids = sample_match_ids(queryset, 5, probes=8, rounds=2)
+        self.assertEqual(sorted(ids), rare)
+        # aggregate + 2 ta id probe + count + kam sonli nomzodlar
+        self.assertLessEqual(len(queries), 5)
+
+        # Ketma-ket id lar (7, 8) bo'shliqdan keyingi id (41) dan ko'p tanlanmaydi
+        counts = Counter(sample_match_ids(queryset, 1, probes=2, rounds=1)[0] for _ in range(1500))
+        self.assertEqual(set(counts), set(rare))
+        self.assertTrue(all(350 < c < 650 for c in counts.values()))
+
+    def test_has_match_candidates(self):
+        profiles = [make_profile(f"hc{i}@test.uz", gender="female") for i in range(5)]
+        queryset = UserProfile.objects.filter(gender="female")
+        ids = {p.id for p in profiles}
+        self.assertTrue(has_match_candidates(queryset, ids - {profiles[4].id}, chunk=2))
+        self.assertFalse(has_match_candidates(queryset, ids, chunk=2))
+
+
+class MatchQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_profile("me@test.uz", gender="male", birth_year=1990)
+        self.candidates = [make_profile(f"q{i}@test.uz", gender="female", birth_year=1995) for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def test_view_pops_from_refilled_queue(self):
+        refill_match_queue(self.me)
+        queue = MatchQueue.objects.get(user_profile=self.me)
+        self.assertEqual(sorted(queue.candidate_ids), sorted(p.id for p in self.candidates))
+        expected = queue.candidate_ids[-1]
+
+        response = self.client.get("/api/v3/search/byprofile/", HTTP_HOST="localhost")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["matched_user"]["id"], expected)
+        queue.refresh_from_db()
+        self.assertEqual(len(queue.candidate_ids), 4)
+        self.assertTrue(queue.needs_refill)
+
+    def test_refill_skips_seen_and_blocked_profiles(self):
+        seen_ids = [p.id for p in self.candidates[:2]]
+        mark_seen(load_seen(self.me), seen_ids)
+        self.me.extension.blocked_users.add(self.candidates[2])
+
+        self.assertEqual(refill_match_queue(self.me, size=2), 2)
+        queue = MatchQueue.objects.get(user_profile=self.me)
+        self.assertEqual(sorted(queue.candidate_ids), sorted(p.id for p in self.candidates[3:]))
+
+    def test_rejected_quota_keeps_popped_candidates(self):
+        refill_match_queue(self.me)
+        before = MatchQueue.objects.get(user_profile=self.me).candidate_ids
+        # Limit get_profile dagi tekshiruvdan keyin (parallel so'rovda) tugagan holat
+        with mock.patch("users.views.consume_requests", return_value=None):
+            single = self.client.get("/api/v3/search/byprofile/", HTTP_HOST="localhost")
+            batch = self.client.get("/api/v3/search/byprofile/batch/?count=3", HTTP_HOST="localhost")
+        self.assertEqual((single.status_code, batch.status_code), (403, 403))
+        self.assertEqual(MatchQueue.objects.get(user_profile=self.me).candidate_ids, before)
+
+    def test_profile_change_marks_queue_for_refill(self):
+        refill_match_queue(self.me)
+        self.me.birth_year = 1985
+        self.me.save()
+        self.assertTrue(MatchQueue.objects.get(user_profile=self.me).needs_refill)
+
+
+class RankMatchCandidatesTests(TestCase):
+    def test_orders_by_shared_attributes_and_age(self):
+        sport, music = Interest.objects.create(title="Sport"), Interest.objects.create(title="Music")
+        me = make_profile("me@test.uz", gender="male", birth_year=1990)
+        me.interests.set([sport, music])
+
+        both = make_profile("both@test.uz", gender="female", birth_year=1992)
+        both.interests.set([sport, music])
+        one = make_profile("one@test.uz", gender="female", birth_year=1992)
+        one.interests.set([sport])
+        one_younger = make_profile("younger@test.uz", gender="female", birth_year=2004)
+        one_younger.interests.set([music])
+        make_profile("none@test.uz", gender="female", birth_year=1992)
+
+        ranked = rank_match_candidates(me, 10)
+
+        self.assertEqual([pid for pid, _ in ranked], [both.id, one.id, one_younger.id])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+
+
+class ProfileMaskTests(TestCase):
+    def test_masks_follow_m2m_changes(self):
+        sport, music = Interest.objects.create(title="Sport"), Interest.objects.create(title="Music")
+        family = Purpose.objects.create(title="Oila")
+        profile = make_profile("mask@test.uz")
+
+        profile.interests.set([sport, music])
+        profile.purposes.add(family)
+        profile.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.interests_mask, ids_to_mask([sport.id, music.id]))
+        self.assertEqual(profile.purposes_mask, ids_to_mask([family.id]))
+
+        profile.interests.remove(sport)
+        profile.refresh_from_db()
+        self.assertEqual(profile.interests_mask, ids_to_mask([music.id]))
+
+        music.userprofile_set.clear()
+        profile.refresh_from_db()
+        self.assertEqual(profile.interests_mask, 0)
+
+    def test_mask_similarity_helpers(self):
+        a, b = ids_to_mask([1, 2, 3]), ids_to_mask([2, 3, 4, 5])
+        self.assertEqual(mask_overlap(a, b), 2)
+        self.assertAlmostEqual(mask_jaccard(a, b), 2 / 5)
+        self.assertEqual(mask_overlaps(a, [b, 0, a]).tolist(), [2, 0, 3])
+        self.assertEqual(mask_jaccards(a, [b, 0]).tolist(), [0.4, 0.0])
+
+
+class MatchBatchViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_profile("me@test.uz", gender="male", birth_year=1990)
+        self.candidates = [make_profile(f"b{i}@test.uz", gender="female", birth_year=1995) for i in range(8)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def test_returns_distinct_candidates_and_charges_once(self):
+        refill_match_queue(self.me, size=3)
+
+        response = self.client.get("/api/v3/search/byprofile/batch/?count=6", HTTP_HOST="localhost")
+
+        self.assertEqual(response.status_code, 200)
+        ids = [m["id"] for m in response.json()["matched_users"]]
+        self.assertEqual(len(ids), 6)
+        self.assertEqual(len(set(ids)), 6)
+        self.assertTrue(set(ids) <= {p.id for p in self.candidates})
+        self.me.extension.refresh_from_db()
+        self.assertEqual(self.me.extension.requests_left, 44)
+
+    def test_batch_is_capped_by_remaining_quota(self):
+        extension = self.me.extension
+        extension.requests_left = 2
+        extension.save()
+
+        response = self.client.get("/api/v3/search/byprofile/batch/?count=6", HTTP_HOST="localhost")
+
+        self.assertEqual(len(response.json()["matched_users"]), 2)
+        self.assertEqual(response.json()["requests_left"], 0)
+
+
+class SeenProfilesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_profile("me@test.uz", gender="male", birth_year=1990)
+        self.candidates = {make_profile(f"v{i}@test.uz", gender="female", birth_year=1995).id for i in range(6)}
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def match_id(self, url="/api/v3/search/byprofile/"):
+        response = self.client.get(url, HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["matched_user"]["id"]
+
+    def test_matches_do_not_repeat_until_all_are_seen(self):
+        first_cycle = [self.match_id() for _ in range(6)]
+        self.assertEqual(set(first_cycle), self.candidates)
+
+        # Hammasi ko'rilgandan keyin yangi davr boshlanadi
+        self.assertIn(self.match_id(), self.candidates)
+        self.assertEqual(SeenProfiles.objects.get(user_profile=self.me).count, 1)
+
+    def test_no_reset_while_unseen_candidates_remain(self):
+        first_cycle = [self.match_id() for _ in range(5)]
+        # Tasodifiy tanlash ko'rilmagan nomzodni topolmasa ham, u bor ekan davr yangilanmaydi
+        with mock.patch("users.views.sample_match_ids", return_value=[]):
+            response = self.client.get("/api/v3/search/byprofile/", HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(SeenProfiles.objects.get(user_profile=self.me).count, 5)
+        self.assertEqual(self.match_id(), (self.candidates - set(first_cycle)).pop())
+
+    def test_ranked_mode_skips_seen_profiles(self):
+        ranked = [self.match_id("/api/v3/search/byprofile/?mode=ranked") for _ in range(6)]
+        self.assertEqual(set(ranked), self.candidates)
+
+    def test_concurrent_first_marks_do_not_collide(self):
+        first, second = load_seen(self.me), load_seen(self.me)  # ikkalasi ham hali saqlanmagan
+        ids = sorted(self.candidates)
+        mark_seen(first, ids[:1])
+        mark_seen(second, ids[1:2])
+        stored = SeenProfiles.objects.get(user_profile=self.me)
+        self.assertEqual(stored.count, 2)
+        self.assertTrue(all(pid in stored for pid in ids[:2]))
+
+    def test_filter_is_written_only_on_flush(self):
+        seen = mark_seen(load_seen(self.me), [1])
+        with CaptureQueriesContext(connection) as queries:
+            mark_seen(seen, [2])
+        self.assertNotIn("bloom", queries[-1]["sql"])
+
+        ids = list(range(3, SeenProfiles.SEEN_FLUSH_SIZE + 1))
+        with CaptureQueriesContext(connection) as queries:
+            mark_seen(seen, ids)
+        self.assertIn("bloom", queries[-1]["sql"])
+        stored = load_seen(self.me)
+        self.assertEqual(stored.pending_ids, [])
+        self.assertEqual(stored.count, SeenProfiles.SEEN_FLUSH_SIZE)
+        self.assertTrue(all(pid in stored for pid in range(1, SeenProfiles.SEEN_FLUSH_SIZE + 1)))
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(num_bits=8192, num_hashes=4)
+        for i in range(500):
+            bloom.add(i)
+        restored = BloomFilter(bloom.to_bytes(), num_bits=8192, num_hashes=4)
+        self.assertTrue(all(i in restored for i in range(500)))
+        false_positives = sum(i in restored for i in range(10_000, 20_000))
+        self.assertLess(false_positives, 500)
+
+
+class BlockedProfilesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_profile("me@test.uz", gender="male", birth_year=1990, latitude=41.3, longitude=69.25)
+        self.blocked = make_profile("x@test.uz", gender="female", birth_year=1995, latitude=41.3, longitude=69.25)
+        self.blocker = make_profile("y@test.uz", gender="female", birth_year=1995, latitude=41.3, longitude=69.25)
+        self.free = make_profile("z@test.uz", gender="female", birth_year=1995, latitude=41.3, longitude=69.25)
+        self.me.extension.blocked_users.add(self.blocked)
+        self.blocker.extension.blocked_users.add(self.me)
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def test_block_set_is_bidirectional_and_invalidated(self):
+        self.assertEqual(blocked_profile_ids(self.me.id), {self.blocked.id, self.blocker.id})
+        self.assertEqual(blocked_profile_ids(self.blocked.id), {self.me.id})
+
+        self.me.extension.blocked_users.remove(self.blocked)
+        self.assertEqual(blocked_profile_ids(self.me.id), {self.blocker.id})
+        self.assertEqual(blocked_profile_ids(self.blocked.id), set())
+
+        self.me.blocked_by.clear()
+        self.assertEqual(blocked_profile_ids(self.me.id), set())
+        self.assertEqual(blocked_profile_ids(self.blocker.id), set())
+
+    def test_search_paths_skip_blocked_profiles(self):
+        profile_index.rebuild()
+        nearby = self.client.get("/api/v3/search/bylatlong/?lat=41.3&lon=69.25", HTTP_HOST="localhost").json()
+        self.assertEqual({p["id"] for p in nearby["nearby_profiles"]}, {self.me.id, self.free.id})
+
+        batch = self.client.get("/api/v3/search/byprofile/batch/?count=5", HTTP_HOST="localhost").json()
+        self.assertEqual([m["id"] for m in batch["matched_users"]], [self.free.id])
+
+
+class ConsumeRequestsTests(TestCase):
+    def setUp(self):
+        self.profile = make_profile("q@test.uz")
+        UserProfileExtension.objects.filter(user_profile=self.profile).update(requests_left=3)
+
+    def test_decrements_until_exhausted(self):
+        self.assertEqual(consume_requests(self.profile.id, 2), 1)
+        self.assertIsNone(consume_requests(self.profile.id, 2))
+        self.assertEqual(consume_requests(self.profile.id), 0)
+        self.assertIsNone(consume_requests(self.profile.id))
+
+    def test_resets_after_a_day(self):
+        UserProfileExtension.objects.filter(user_profile=self.profile).update(
+            requests_left=0, last_reset=timezone.now() - timedelta(days=1, minutes=1)
+        )
+        self.assertEqual(consume_requests(self.profile.id), 49)
+
+        extension = UserProfileExtension.objects.get(user_profile=self.profile)
+        self.assertGreater(extension.last_reset, timezone.now() - timedelta(minutes=1))
+
+    def test_expired_quota_is_read_without_writing(self):
+        UserProfileExtension.objects.filter(user_profile=self.profile).update(
+            requests_left=0, last_reset=timezone.now() - timedelta(days=2)
+        )
+        extension = UserProfileExtension.objects.get(user_profile=self.profile)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(remaining_requests(extension), 50)
+
+    def test_bulk_reset_command(self):
+        other = make_profile("q2@test.uz")
+        UserProfileExtension.objects.update(requests_left=0)
+        UserProfileExtension.objects.filter(user_profile=other).update(last_reset=timezone.now() - timedelta(days=2))
+
+        call_command("reset_daily_quotas", "--expired-only", "--batch-size", "1", stdout=StringIO())
+        left = dict(UserProfileExtension.objects.values_list("user_profile_id", "requests_left"))
+        self.assertEqual(left, {self.profile.id: 0, other.id: 50})
+
+        call_command("reset_daily_quotas", stdout=StringIO())
+        self.assertEqual(set(UserProfileExtension.objects.values_list("requests_left", flat=True)), {50})
+
+
+class ConsumeRequestsConcurrencyTests(TransactionTestCase):
+    def test_parallel_consumers_never_overspend(self):
+        profile = make_profile("race@test.uz")
+        UserProfileExtension.objects.filter(user_profile=profile).update(requests_left=30)
+
+        def worker(_):
+            try:
+                return consume_requests(profile.id)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(worker, range(60)))
+
+        granted = [r for r in results if r is not None]
+        self.assertEqual(len(granted), 30)
+        self.assertEqual(sorted(granted), list(range(30)))
+        self.assertEqual(UserProfileExtension.objects.get(user_profile=profile).requests_left, 0)
+
+
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        self.bucket = TokenBucket(capacity=3, period=60, timer=lambda: self.now)
+
+    def test_refills_at_rate(self):
+        self.assertEqual([self.bucket.consume("k")[0] for _ in range(4)], [True, True, True, False])
+        self.assertAlmostEqual(self.bucket.consume("k")[1], 20.0)
+
+        self.now += 20
+        self.assertTrue(self.bucket.consume("k")[0])
+        self.assertFalse(self.bucket.consume("k")[0])
+        self.assertTrue(self.bucket.consume("other")[0])
+
+    def test_otp_endpoint_returns_retry_after(self):
+        for _ in range(3):
+            response = self.client.post(
+                "/api/v3/auth/forgot-password/", {"email_or_phone": "nobody@test.uz"}, HTTP_HOST="localhost"
+            )
+            self.assertEqual(response.status_code, 404)
+
+        response = self.client.post(
+            "/api/v3/auth/forgot-password/", {"email_or_phone": "nobody@test.uz"}, HTTP_HOST="localhost"
+        )
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_otp_key_hashes_normalized_destination(self):
+        factory = APIRequestFactory()
+
+        def key(destination):
+            request = Request(factory.post("/", {"email_or_phone": destination}, format="json"), parsers=[JSONParser()])
+            return OTPRateThrottle().get_cache_key(request, None)
+
+        self.assertEqual(key("Nobody@Test.uz "), key("nobody@test.uz"))
+        self.assertNotEqual(key("nobody@test.uz"), key("other@test.uz"))
+        self.assertNotIn("nobody", key("nobody@test.uz"))
+
+
+class SendRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = make_profile("alice@test.uz")
+        self.bob = make_profile("bob@test.uz")
+
+    def send(self, sender, to_profile_id):
+        client = APIClient()
+        client.force_authenticate(sender.user)
+        return client.post(
+            "/api/v3/auth/profile/send-request/", {"to_profile_id": to_profile_id}, HTTP_HOST="localhost"
+        )
+
+    def statuses(self):
+        return dict(
+            ((f, t), s) for f, t, s in Connection.objects.values_list("from_profile_id", "to_profile_id", "status")
+        )
+
+    def test_request_then_mutual_match(self):
+        self.assertEqual(self.send(self.alice, self.bob.id).json()["message"], "Zapros muvaffaqiyatli yuborildi.")
+        self.assertEqual(self.send(self.alice, self.bob.id).json()["message"], "Siz bu foydalanuvchiga allaqachon zapros yuborgansiz.")
+        self.assertEqual(self.statuses(), {(self.alice.id, self.bob.id): Connection.PENDING})
+
+        self.assertEqual(self.send(self.bob, self.alice.id).json()["message"], "Siz va bu foydalanuvchi obuna bo'ldingiz.")
+        self.assertEqual(self.statuses(), {
+            (self.alice.id, self.bob.id): Connection.ACCEPTED,
+            (self.bob.id, self.alice.id): Connection.ACCEPTED,
+        })
+        self.assertEqual(self.send(self.alice, self.bob.id).json()["message"], "Siz bu foydalanuvchiga allaqachon obuna bo'lgansiz.")
+
+    def test_cannot_request_self(self):
+        self.assertEqual(self.send(self.alice, self.alice.id).status_code, 400)
+
+    def test_query_count_is_fixed(self):
+        # profil id + SAVEPOINT + ikkala profil qulfi + juftlikni o'qish + INSERT + RELEASE
+        with self.assertNumQueries(6):
+            self.send(self.alice, self.bob.id)
+        with self.assertNumQueries(6):
+            self.send(self.bob, self.alice.id)
+        # Allaqachon obuna: INSERT yo'q
+        with self.assertNumQueries(5):
+            self.send(self.alice, self.bob.id)
+
+    def test_unknown_target(self):
+        self.assertEqual(self.send(self.alice, 10 ** 9).status_code, 404)
+
+
+class BulkSendRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_profile("me@test.uz")
+        self.others = [make_profile(f"o{i}@test.uz") for i in range(6)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def send(self, ids):
+        return self.client.post(
+            "/api/v3/auth/profile/send-requests/",
+            {"to_profile_ids": ids},
+            format="json",
+            HTTP_HOST="localhost",
+        )
+
+    def test_per_target_outcomes(self):
+        a, b, c = self.others[:3]
+        Connection.objects.create(from_profile=a, to_profile=self.me)
+        Connection.objects.create(from_profile=self.me, to_profile=b)
+
+        response = self.send([a.id, b.id, c.id, 10 ** 9])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {r["to_profile_id"]: r["status"] for r in response.json()["results"]},
+            {a.id: "matched", b.id: "already_requested", c.id: "requested", 10 ** 9: "not_found"},
+        )
+        self.assertEqual(Connection.objects.get(from_profile=a, to_profile=self.me).status, Connection.ACCEPTED)
+        self.assertEqual(Connection.objects.get(from_profile=self.me, to_profile=c).status, Connection.PENDING)
+
+    def test_query_count_does_not_grow_with_targets(self):
+        with CaptureQueriesContext(connection) as small:
+            self.send([p.id for p in self.others[:2]])
+        with CaptureQueriesContext(connection) as large:
+            self.send([p.id for p in self.others[2:]])
+        self.assertEqual(len(small), len(large))
+
+    def test_own_id_is_reported_as_self(self):
+        response = self.send([self.me.id, self.others[0].id])
+        self.assertEqual(
+            {r["to_profile_id"]: r["status"] for r in response.json()["results"]},
+            {self.me.id: "self", self.others[0].id: "requested"},
+        )
+        self.assertEqual(self.send([self.me.id]).json()["results"], [{"to_profile_id": self.me.id, "status": "self"}])
+        self.assertFalse(Connection.objects.filter(from_profile=self.me, to_profile=self.me).exists())
+
+
+class ConnectionListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_profile("me@test.uz")
+        self.senders = [make_profile(f"s{i}@test.uz") for i in range(5)]
+        base = timezone.now()
+        for i, sender in enumerate(self.senders):
+            # ikkitasi bir xil vaqtda — tartib id bo'yicha aniqlanadi
+            Connection.objects.create(from_profile=sender, to_profile=self.me, created_at=base - timedelta(minutes=min(i, 3)))
+        Connection.objects.create(from_profile=self.me, to_profile=self.senders[0], status=Connection.ACCEPTED)
+        self.client = APIClient()
+        self.client.force_authenticate(self.me.user)
+
+    def test_incoming_pages_cover_all_in_order(self):
+        seen, cursor = [], None
+        while True:
+            url = "/api/v3/auth/profile/requests/incoming/?limit=2" + (f"&cursor={cursor}" if cursor else "")
+            data = self.client.get(url, HTTP_HOST="localhost").json()
+            seen += [card["id"] for card in data["results"]]
+            cursor = data["next"]
+            if not cursor:
+                break
+        expected = [p.id for p in self.senders[:3]] + sorted([p.id for p in self.senders[3:]], reverse=True)
+        self.assertEqual(seen, expected)
+
+    def test_matches_and_outgoing(self):
+        matches = self.client.get("/api/v3/auth/profile/matches/", HTTP_HOST="localhost").json()
+        self.assertEqual([c["id"] for c in matches["results"]], [self.senders[0].id])
+        self.assertIsNone(matches["next"])
+        outgoing = self.client.get("/api/v3/auth/profile/requests/outgoing/", HTTP_HOST="localhost").json()
+        self.assertEqual(outgoing["results"], [])
+
+    def test_user_token_header(self):
+        client = APIClient()
+        response = client.get("/api/v3/auth/profile/matches/", HTTP_X_USER_TOKEN=self.me.user.token, HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c["id"] for c in response.json()["results"]], [self.senders[0].id])
+
+    def test_matches_are_ordered_by_acceptance(self):
+        # senders[4] ning zaprosi eng eski, lekin obuna eng oxirida bo'ldi
+        send_request(self.me.id, self.senders[4].id)
+        matches = self.client.get("/api/v3/auth/profile/matches/", HTTP_HOST="localhost").json()
+        self.assertEqual([c["id"] for c in matches["results"]], [self.senders[4].id, self.senders[0].id])
+        accepted = Connection.objects.get(from_profile=self.senders[4], to_profile=self.me)
+        self.assertEqual(accepted.status, Connection.ACCEPTED)
+        self.assertGreater(accepted.created_at, timezone.now() - timedelta(minutes=1))
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for sender in self.senders:
+            UserImage.objects.create(user_profile=sender, image="x.jpg", is_main=True)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get("/api/v3/auth/profile/requests/incoming/?limit=1", HTTP_HOST="localhost")
+        with CaptureQueriesContext(connection) as large:
+            self.client.get("/api/v3/auth/profile/requests/incoming/?limit=5", HTTP_HOST="localhost")
+        self.assertEqual(len(small), len(large))
+
+
+class UserTokenCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_profile("tok@test.uz").user
+
+    def test_lookup_is_cached(self):
+        self.assertEqual(user_id_for_token(self.user.token), self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_id_for_token(self.user.token), self.user.id)
+        self.assertIsNone(user_id_for_token("missing"))
+
+    def test_token_change_and_deactivation_invalidate(self):
+        old_token = self.user.token
+        user_id_for_token(old_token)
+        self.user.token = "new-token"
+        self.user.save()
+        self.assertIsNone(user_id_for_token(old_token))
+        self.assertEqual(user_id_for_token("new-token"), self.user.id)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_id_for_token("new-token"))
+
+    def test_authentication_class(self):
+        request = Request(APIRequestFactory().get("/", HTTP_X_USER_TOKEN=self.user.token))
+        user, token = UserTokenAuthentication().authenticate(request)
+        self.assertEqual((user, token), (self.user, self.user.token))
+        self.assertIsNone(UserTokenAuthentication().authenticate(Request(APIRequestFactory().get("/"))))
+        # Eski klientlar: ?token= va so'rov tanasidagi "token"
+        request = Request(APIRequestFactory().get(f"/?token={self.user.token}"))
+        self.assertEqual(UserTokenAuthentication().authenticate(request)[0], self.user)
+        request = Request(APIRequestFactory().post("/", {"token": self.user.token}, format="json"))
+        request.parsers = [JSONParser()]
+        self.assertEqual(UserTokenAuthentication().authenticate(request)[0], self.user)
+
+    def test_cached_user_is_built_without_queries(self):
+        UserTokenAuthentication().authenticate(Request(APIRequestFactory().get(f"/?user_token={self.user.token}")))
+        with self.assertNumQueries(0):
+            user, _ = UserTokenAuthentication().authenticate(
+                Request(APIRequestFactory().get("/", HTTP_X_USER_TOKEN=self.user.token))
+            )
+        self.assertEqual((user.pk, user.email, user.name), (self.user.pk, self.user.email, self.user.name))
+        self.assertFalse(user._state.adding)
+        cached = cache.get(user_token_cache_key(self.user.token))
+        self.assertNotIn("password", cached)
+        self.assertNotIn("last_login", cached)
+        # Keshlanmagan maydon kerak bo'lsa DB dan o'qiladi
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password("") is False)
+
+        self.user.name = "Yangi"
+        self.user.save()
+        user, _ = UserTokenAuthentication().authenticate(
+            Request(APIRequestFactory().get("/", HTTP_X_USER_TOKEN=self.user.token))
+        )
+        self.assertEqual(user.name, "Yangi")
+
+
+class JWTOrUserTokenAuthenticationTests(TestCase):
+    url = "/api/v3/profile-data-update/"
+
+    def setUp(self):
+        cache.clear()
+        self.user = make_profile("both@test.uz").user
+        self.client = APIClient()
+
+    def test_jwt_is_verified_once(self):
+        access = str(RefreshToken.for_user(self.user).access_token)
+        with mock.patch.object(
+            JWTAuthentication, "get_validated_token", autospec=True,
+            side_effect=JWTAuthentication.get_validated_token,
+        ) as validate:
+            response = self.client.patch(self.url, {"name": "Jwt"}, format="json",
+                                         HTTP_AUTHORIZATION=f"Bearer {access}", HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(validate.call_count, 1)
+
+    def test_user_token_and_fallback(self):
+        response = self.client.patch(f"{self.url}?user_token={self.user.token}", {"name": "Tok"}, format="json",
+                                     HTTP_AUTHORIZATION="Bearer broken", HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, "Tok")
+
+        response = self.client.patch(self.url, {"name": "X"}, format="json", HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 401)
+
+    def test_legacy_token_sources(self):
+        other = make_profile("legacy@test.uz")
+        response = self.client.post("/api/v3/auth/profile/send-request/",
+                                    {"token": self.user.token, "to_profile_id": other.id}, format="json",
+                                    HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(f"/api/v3/check/limit/?token={self.user.token}", HTTP_HOST="localhost")
+        self.assertNotEqual(response.status_code, 401)
+
+
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_profile("pw@test.uz").user
+        self.user.set_password("secret-123")
+        self.user.save()
+
+    def test_login(self):
+        response = self.client.post(
+            "/api/v3/auth/login/", {"email": "pw@test.uz", "password": "secret-123"}, HTTP_HOST="localhost"
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(
+            "/api/v3/auth/login/", {"email": "pw@test.uz", "password": "wrong"}, HTTP_HOST="localhost"
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_rehashes_when_cost_changes(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            response = self.client.post(
+                "/api/v3/auth/login/", {"email": "pw@test.uz", "password": "secret-123"}, HTTP_HOST="localhost"
+            )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertIn("$2000$", self.user.password)
+
+    def test_reset_password(self):
+        response = self.client.post(
+            "/api/v3/auth/reset-password/", {"email_or_phone": "pw@test.uz", "new_password": "new-456"}, HTTP_HOST="localhost"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new-456"))
+
+    def test_busy_pool_returns_503(self):
+        busy = PasswordHashPool(workers=1, queue_size=0, wait_timeout=0.05)
+        gate = threading.Event()
+
+        async def scenario():
+            first = asyncio.ensure_future(busy.run(gate.wait))
+            await asyncio.sleep(0.01)  # birinchi vazifa yagona slotni egallaydi
+            try:
+                with self.assertRaises(PasswordHashBusy):
+                    await busy.run(lambda: None)
+            finally:
+                gate.set()
+                await first
+            self.assertIsNone(await busy.run(lambda: None))
+
+        async_to_sync(scenario)()
+        busy.shutdown()
+
+        with mock.patch("users.passwords.password_pool.run", side_effect=PasswordHashBusy()):
+            response = self.client.post(
+                "/api/v3/auth/login/", {"email": "pw@test.uz", "password": "secret-123"}, HTTP_HOST="localhost"
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+@override_settings(JWT_PROFILE_CLAIMS_ENABLED=True)
+class ProfileClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.me = make_profile("claims@test.uz", gender="male", birth_year=1990)
+        self.candidates = [make_profile(f"c{i}@test.uz", gender="female", birth_year=1995) for i in range(3)]
+
+    def access(self):
+        return add_profile_claims(RefreshToken.for_user(self.me.user), self.me.user).access_token
+
+    def authenticate(self, access):
+        return ProfileClaimsAuthentication().get_user(ProfileClaimsAuthentication().get_validated_token(str(access)))
+
+    def test_fresh_claims_skip_user_and_profile_reads(self):
+        access = self.access()
+        self.assertEqual(access["ps"]["pid"], self.me.id)
+        self.authenticate(access)  # versiya keshga tushadi
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v3/search/byprofile/", HTTP_AUTHORIZATION=f"Bearer {access}", HTTP_HOST="localhost")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["token"], self.me.user.token)
+        self.assertFalse([q for q in queries if 'FROM "users_customuser"' in q["sql"]])
+
+    def test_stale_version_falls_back_to_database(self):
+        access = self.access()
+        self.assertIsInstance(self.authenticate(access), ProfileClaimsUser)
+
+        profile = UserProfile.objects.get(id=self.me.id)
+        profile.birth_year = 1991
+        profile.save()
+
+        user = self.authenticate(access)
+        self.assertNotIsInstance(user, ProfileClaimsUser)
+        self.assertEqual(user.pk, self.me.user.pk)
+
+    def test_unrelated_changes_keep_version(self):
+        profile = UserProfile.objects.get(id=self.me.id)
+        profile.bio = "salom"
+        profile.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.claims_version, 0)
+
+
+FAKE_TRANSPORTS = {"email": "users.outbox.FakeTransport", "telegram": "users.outbox.FakeTransport"}
+
+
+@override_settings(OUTBOX_TRANSPORTS=FAKE_TRANSPORTS, OUTBOX_MAX_ATTEMPTS=3, OUTBOX_BACKOFF_SECONDS=10)
+class OutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        FakeTransport.reset()
+
+    def test_forgot_password_only_enqueues(self):
+        make_profile("otp@test.uz")
+        response = self.client.post(
+            "/api/v3/auth/forgot-password/", {"email_or_phone": "otp@test.uz"}, HTTP_HOST="localhost",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FakeTransport.sent, [])
+        message = OutboxMessage.objects.get()
+        self.assertEqual((message.channel, message.recipient, message.status), ("email", "otp@test.uz", "pending"))
+
+        self.assertEqual(deliver_pending(), (1, 0))
+        message.refresh_from_db()
+        self.assertEqual(message.status, OutboxMessage.SENT)
+        self.assertEqual(message.body, "")
+        self.assertEqual(FakeTransport.sent[0][1], "otp@test.uz")
+
+    def test_failed_send_backs_off_then_gives_up(self):
+        message = OutboxMessage.objects.create(channel="telegram", recipient="42", body="Tasdiqlash kodi: 123456")
+        FakeTransport.reset(fail_times=10)
+
+        with self.assertLogs("users.outbox", "WARNING"):
+            self.assertEqual(deliver_pending(), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.PENDING, 1))
+        self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=8))
+        self.assertIn("fake transport", message.last_error)
+        self.assertEqual(message.body, "Tasdiqlash kodi: 123456")
+
+        # Vaqti kelmagan xabar qayta olinmaydi
+        self.assertEqual(deliver_pending(), (0, 0))
+
+        for _ in range(2):
+            OutboxMessage.objects.filter(id=message.id).update(next_attempt_at=timezone.now())
+            deliver_pending()
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), (OutboxMessage.FAILED, 3))
+        self.assertEqual(message.body, "")
+
+    def test_batch_is_sent_concurrently_once(self):
+        OutboxMessage.objects.bulk_create([
+            OutboxMessage(channel="email", recipient=f"u{i}@test.uz", body="kod") for i in range(20)
+        ])
+        call_command("deliver_outbox", "--batch-size", "50", "--concurrency", "4", stdout=StringIO())
+        self.assertEqual(len(FakeTransport.sent), 20)
+        self.assertEqual(OutboxMessage.objects.filter(status=OutboxMessage.SENT).count(), 20)
+        self.assertEqual(deliver_pending(), (0, 0))
+
+
+class TelegramStubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.path, payload, self.client_address))
+        ok = payload["chat_id"] != "bad"
+        body = json.dumps({"ok": ok}).encode()
+        self.send_response(200 if ok else 400)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TelegramClientTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), TelegramStubHandler)
+        self.server.requests = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client_ = TelegramClient(
+            token="T", base_url=f"http://127.0.0.1:{self.server.server_port}", pool_size=4,
+            connect_timeout=1, read_timeout=2,
+        )
+
+    def tearDown(self):
+        self.client_.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_fan_out_reuses_connections(self):
+        for _ in range(3):
+            results = self.client_.send_many(["1", "2", "3"], "Tasdiqlash kodi: 123456")
+            self.assertEqual([r.chat_id for r in results], ["1", "2", "3"])
+            self.assertTrue(all(r.ok for r in results))
+
+        self.assertEqual(len(self.server.requests), 9)
+        self.assertEqual({path for path, _, _ in self.server.requests}, {"/botT/sendMessage"})
+        # 9 ta so'rov, lekin ulanishlar pool dan qayta ishlatiladi
+        self.assertLessEqual(len({address for _, _, address in self.server.requests}), 3)
+
+        metrics = self.client_.metrics.snapshot()
+        self.assertEqual((metrics["calls"], metrics["errors"]), (9, 0))
+        self.assertGreater(metrics["max"], 0)
+
+    def test_failed_chat_does_not_stop_others(self):
+        results = self.client_.send_many(["1", "bad", "2"], "kod")
+        self.assertEqual([r.ok for r in results], [True, False, True])
+        self.assertIn("400", results[1].error)
+        self.assertEqual(self.client_.metrics.snapshot()["errors"], 1)
+
+    def test_outbox_sends_telegram_batch_through_client(self):
+        OutboxMessage.objects.bulk_create(
+            [OutboxMessage(channel="telegram", recipient=chat_id, body="Tasdiqlash kodi: 111111") for chat_id in ("1", "2", "bad")]
+            + [OutboxMessage(channel="telegram", recipient="1", body="Tasdiqlash kodi: 222222")]
+        )
+        with mock.patch("users.outbox.telegram_client", self.client_), self.assertLogs("users.outbox", "WARNING"):
+            self.assertEqual(deliver_pending(), (3, 1))
+
+        self.assertEqual(
+            sorted((p["chat_id"], p["text"][-6:]) for _, p, _ in self.server.requests),
+            [("1", "111111"), ("1", "222222"), ("2", "111111"), ("bad", "111111")],
+        )
+        self.assertEqual(self.client_.metrics.snapshot()["calls"], 4)
+        failed = OutboxMessage.objects.get(recipient="bad")
+        self.assertEqual((failed.status, failed.attempts), (OutboxMessage.PENDING, 1))
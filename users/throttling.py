@@ -0,0 +1,111 @@
+# users/throttling.py
+#
+# Django cache ustidagi token-bucket cheklovchi va DRF throttle klasslari.
+# Tekshiruv faqat keshga murojaat qiladi — Postgres ga so'rov yubormaydi.
+# Tezliklar REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] da "son/davr" ko'rinishida
+# beriladi: "10/min" — chelakda 10 ta token, har daqiqada 10 tasi qayta to'ladi.
+
+import hashlib
+import time
+
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucket:
+    """
+    Kalit bo'yicha token chelagi. Holat keshda (tokens, vaqt) juftligi sifatida saqlanadi.
+
+    Kesh get/set atomar emas, shuning uchun bir vaqtda kelgan bir nechta so'rov
+    chegarani bir-ikki tokenga oshirib yuborishi mumkin — suiste'molni to'xtatish uchun bu yetarli.
+    """
+
+    def __init__(self, capacity, period, cache_alias="default", timer=time.time):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period  # soniyasiga token
+        self.cache = caches[cache_alias]
+        self.timer = timer
+
+    def consume(self, key, tokens=1):
+        """(ruxsat, kutish_soniyasi) — ruxsat bo'lmasa keyingi token qachon tushishi"""
+        now = self.timer()
+        available, updated = self.cache.get(key, (self.capacity, now))
+        available = min(self.capacity, available + (now - updated) * self.rate)
+
+        if available >= tokens:
+            available -= tokens
+            wait = 0.0
+            allowed = True
+        else:
+            wait = (tokens - available) / self.rate
+            allowed = False
+
+        # Chelak to'liq to'lgandan keyin yozuv keraksiz — kesh o'zi o'chiradi
+        timeout = int((self.capacity - available) / self.rate) + 1
+        self.cache.set(key, (available, now), timeout)
+        return allowed, wait
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle ning token-bucket varianti: sirpanuvchi oyna tarixini
+    saqlash o'rniga bitta (tokens, vaqt) yozuvi. Rad etilganda DRF
+    wait() asosida Retry-After sarlavhasini qo'yadi.
+    """
+    cache_alias = "default"
+    cache_format = "throttle_bucket_%(scope)s_%(ident)s"
+
+    def __init__(self):
+        super().__init__()
+        self.bucket = None
+        if self.rate is not None:
+            self.bucket = TokenBucket(self.num_requests, self.duration, self.cache_alias, self.timer)
+        self._wait = None
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+    def allow_request(self, request, view):
+        if self.bucket is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        allowed, self._wait = self.bucket.consume(key)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class MatchRateThrottle(TokenBucketThrottle):
+    scope = "match"
+
+
+class SendRequestRateThrottle(TokenBucketThrottle):
+    scope = "send_request"
+
+
+class OTPRateThrottle(TokenBucketThrottle):
+    """Kod yuborish: kalit — kod yuboriladigan email/telefon (bo'lmasa IP)"""
+    scope = "otp"
+
+    def get_cache_key(self, request, view):
+        destination = request.data.get("email_or_phone") if hasattr(request, "data") else None
+        if destination:
+            # Manzil kalitda ochiq turmasligi uchun normallashtirilgan qiymatning hashi
+            normalized = "".join(str(destination).split()).lower()
+            ident = hashlib.sha256(normalized.encode()).hexdigest()
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class OTPIPRateThrottle(TokenBucketThrottle):
+    """Kod yuborish: bitta IP dan turli manzillarga yuborishni cheklash"""
+    scope = "otp_ip"
@@ -1,6 +1,6 @@
 
 from django.urls import path
-from .views import MatchUserView,RegionListAPIView,DistrictListAPIView,InterestListAPIView,PurposeListAPIView,UserImageAPIView,UpdateUserProfileAPIView,GetUserByTokenAPIView,NearbyProfilesAPIView,SomeProtectedAPIView,SendRequestAPIView,UploadUserImagesAPIView,ProfileUpdateAPIView,RequestSMSCodeView, VerifySMSCodeView,LoginView,ForgotPasswordRequestAPIView,VerifyCodeAPIView,ResetPasswordAPIView
+from .views import MatchUserView,MatchBatchView,RegionListAPIView,DistrictListAPIView,InterestListAPIView,PurposeListAPIView,UserImageAPIView,UpdateUserProfileAPIView,GetUserByTokenAPIView,NearbyProfilesAPIView,SomeProtectedAPIView,SendRequestAPIView,BulkSendRequestAPIView,IncomingRequestsAPIView,OutgoingRequestsAPIView,ConnectionMatchesAPIView,UploadUserImagesAPIView,ProfileUpdateAPIView,RequestSMSCodeView, VerifySMSCodeView,LoginView,ForgotPasswordRequestAPIView,VerifyCodeAPIView,ResetPasswordAPIView
 
 
 urlpatterns = [
@@ -20,7 +20,12 @@ urlpatterns = [
     path('auth/profile/update-datas/', ProfileUpdateAPIView.as_view(), name='profile_update'),
     path('auth/profile/upload-images/', UploadUserImagesAPIView.as_view(), name='update_images'),
     path('auth/profile/send-request/', SendRequestAPIView.as_view(), name='send_request'),
+    path('auth/profile/send-requests/', BulkSendRequestAPIView.as_view(), name='send_requests'),
+    path('auth/profile/requests/incoming/', IncomingRequestsAPIView.as_view(), name='requests_incoming'),
+    path('auth/profile/requests/outgoing/', OutgoingRequestsAPIView.as_view(), name='requests_outgoing'),
+    path('auth/profile/matches/', ConnectionMatchesAPIView.as_view(), name='connection_matches'),
     path('check/limit/', SomeProtectedAPIView.as_view(), name='limittekshirish'),
     path('search/bylatlong/', NearbyProfilesAPIView.as_view(), name='latlongbilanqidirish'),
-    path('search/byprofile/', MatchUserView.as_view(), name='search-byprofile')
+    path('search/byprofile/', MatchUserView.as_view(), name='search-byprofile'),
+    path('search/byprofile/batch/', MatchBatchView.as_view(), name='search-byprofile-batch'),
 ]
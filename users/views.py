@@ -5,93 +5,216 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from datetime import timedelta,date
-from .models import CustomUser,UserProfile,Purpose,Interest,UserImage,UserProfileExtension,Region,District,PendingUser
+from .models import CustomUser,UserProfile,Purpose,Interest,UserImage,UserProfileExtension,Region,District,PendingUser,Connection
 import random
 import secrets
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.shortcuts import get_object_or_404
 from .serializers import FullUserProfileSerializer,MatchedUserSerializer,CustomUserSerializer,PurposeSerializer,InterestSerializer,RegionSerializer,DistrictSerializer  # Quyida serializerni ham yozamiz
-from .functions import haversine_distance
+from .serializers import main_image_prefetch, get_main_image
+from .functions import nearby_profiles_queryset, nearest_in_rows, encode_cursor, decode_cursor, blocked_profile_ids
+from .spatial_index import profile_index
+from .matching import build_match_queryset, sample_match_ids, pop_match_candidates, rank_match_candidates
+from .matching import Excluding, has_match_candidates, load_seen, mark_seen
+from .quota import consume_requests, remaining_requests
+from .connections import ALREADY_CONNECTED, ALREADY_REQUESTED, MATCHED, NOT_FOUND, REQUESTED, send_request, send_requests
+from .authentication import JWTOrUserTokenAuthentication, ProfileClaimsAuthentication, ProfileClaimsUser, add_profile_claims
+from .async_views import AsyncAPIView
+from .passwords import acheck_password, aset_password
+from .throttling import MatchRateThrottle, OTPIPRateThrottle, OTPRateThrottle, SendRequestRateThrottle
 from rest_framework.permissions import IsAuthenticated, AllowAny
 import requests
 from rest_framework.status import HTTP_400_BAD_REQUEST, HTTP_401_UNAUTHORIZED, HTTP_403_FORBIDDEN, HTTP_404_NOT_FOUND
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
-from django.db import transaction
+from django.db import DatabaseError, transaction
+from asgiref.sync import sync_to_async
 from django.core.exceptions import ValidationError
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework.exceptions import AuthenticationFailed
 from datetime import datetime
 from django.core.mail import send_mail
 from django.conf import settings
 from django.db.models import Q
-from .functions import send_telegram_code, send_email_code  # send_email_code ham kerak bo‘ladi
+from .outbox import enqueue_email_code, enqueue_telegram_code
+import logging
+
+logger = logging.getLogger(__name__)
 
 MAX_IMAGES_PER_USER = 5
 
 
 class MatchUserView(APIView):
+    """
+    GET /api/v3/search/byprofile/            — tasodifiy mos nomzod
+    GET /api/v3/search/byprofile/?mode=ranked — eng yuqori moslik balli nomzod
+    JWT da profil xulosasi bo'lsa (JWT_PROFILE_CLAIMS_ENABLED) foydalanuvchi va profil DB dan o'qilmaydi.
+    """
+    authentication_classes = [ProfileClaimsAuthentication]
     permission_classes = [IsAuthenticated]
-
-    def get(self, request):
-        user = request.user
-
+    throttle_classes = [MatchRateThrottle]
+    # Navbatdan olingan nomzodlar endi mos kelmasa, necha marta qayta urinish
+    max_queue_pops = 3
+    # ranked rejimda ko'rilganlarni chiqarib tashlash uchun nechta yuqori nomzod olinadi
+    ranked_overfetch = 50
+
+    def load_matches(self, queryset, match_ids):
+        """id lar tartibida, hali ham mos bo'lgan profillar (serializer uchun oldindan yuklangan)"""
+        if not match_ids:
+            return []
+        loaded = MatchedUserSerializer.setup_eager_loading(queryset.filter(id__in=match_ids)).in_bulk()
+        return [loaded[pid] for pid in match_ids if pid in loaded]
+
+    def collect_matches(self, profile, queryset, count, seen, blocked=frozenset()):
+        """
+        Avval oldindan tayyorlangan navbatdan (O(1)), yetmasa jonli so'rovdan `count` tagacha
+        hali ko'rsatilmagan nomzod. Ko'rilmaganlar haqiqatan qolmagandagina yangi davr boshlanadi.
+        """
+        matches = []
+        chosen = set()
+        excluded = Excluding(chosen, blocked, seen)
+        for _ in range(self.max_queue_pops):
+            if len(matches) >= count:
+                break
+            match_ids = pop_match_candidates(profile, count - len(matches))
+            if not match_ids:
+                break
+            loaded = self.load_matches(queryset, [pid for pid in match_ids if pid not in excluded])
+            matches += loaded
+            chosen.update(m.id for m in loaded)
+
+        if len(matches) < count:
+            match_ids = sample_match_ids(queryset, count - len(matches), exclude=excluded)
+            if not match_ids and not matches and seen.count and not has_match_candidates(queryset, excluded):
+                seen.reset()
+                match_ids = sample_match_ids(queryset, count, exclude=excluded)
+            matches += self.load_matches(queryset, match_ids)
+        return matches
+
+    def pick_ranked(self, profile, queryset, seen, blocked=frozenset()):
+        """Hali ko'rsatilmaganlar ichida eng yuqori moslik balli nomzod: (profile, score)"""
+        ranked = [
+            (pid, score) for pid, score in rank_match_candidates(profile, self.ranked_overfetch, queryset)
+            if pid not in blocked
+        ]
+        unseen = [(pid, score) for pid, score in ranked if pid not in seen]
+        if not unseen and ranked and seen.count:
+            seen.reset()
+            unseen = ranked
+        for pid, score in unseen:
+            matches = self.load_matches(queryset, [pid])
+            if matches:
+                return matches[0], score
+        return None, None
+
+    @staticmethod
+    def limit_exhausted():
+        return Response({"detail": "Kunlik limit tugagan."}, status=status.HTTP_403_FORBIDDEN)
+
+    @staticmethod
+    def user_token(user):
+        if isinstance(user, ProfileClaimsUser):
+            return user.token_value
+        return user.token
+
+    def get_profile(self, request):
+        """(profile, extension, None) yoki xato bo'lsa (None, None, Response)"""
         try:
-            profile = user.profile
-            extension = profile.extension
+            if isinstance(request.user, ProfileClaimsUser):
+                # Profil JWT xulosasidan; DB dan faqat limit qatori o'qiladi
+                profile = request.user.build_profile()
+                extension = UserProfileExtension.objects.get(user_profile_id=profile.id)
+            else:
+                profile = request.user.profile
+                extension = profile.extension
         except Exception:
-            return Response({"detail": "Profil topilmadi."}, status=status.HTTP_404_NOT_FOUND)
+            return None, None, Response({"detail": "Profil topilmadi."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Kunlik limit
-        extension.reset_requests_if_needed()
-        if extension.requests_left <= 0:
-            return Response({"detail": "Kunlik limit tugagan."}, status=status.HTTP_403_FORBIDDEN)
+        # Kunlik limit (qoldiq last_reset dan hisoblanadi, bazaga yozilmaydi)
+        if remaining_requests(extension) <= 0:
+            return None, None, self.limit_exhausted()
 
         if not profile.gender:
-            return Response({"detail": "Jins aniqlanmagan."}, status=status.HTTP_400_BAD_REQUEST)
+            return None, None, Response({"detail": "Jins aniqlanmagan."}, status=status.HTTP_400_BAD_REQUEST)
 
-        opposite_gender = "female" if profile.gender == "male" else "male"
-        current_year = datetime.now().year
-        user_age = current_year - profile.birth_year if profile.birth_year else None
+        return profile, extension, None
 
-        min_age, max_age = 18, user_age if user_age else 45
-        min_birth_year = current_year - max_age
-        max_birth_year = current_year - min_age
+    def get(self, request):
+        user = request.user
+        profile, extension, error = self.get_profile(request)
+        if error:
+            return error
+
+        queryset = build_match_queryset(profile)
+        seen = load_seen(profile)
+        blocked = blocked_profile_ids(profile.id)
+        score = None
+        # Navbatdan olish va limitni ayirish bitta tranzaksiyada: limit rad etsa, olingan nomzodlar navbatga qaytadi
+        with transaction.atomic():
+            if request.query_params.get("mode") == "ranked":
+                # Eng yuqori moslik balli nomzod (ball SQL da hisoblanadi)
+                match_user, score = self.pick_ranked(profile, queryset, seen, blocked)
+                matches = [match_user] if match_user else []
+            else:
+                matches = self.collect_matches(profile, queryset, 1, seen, blocked)
+            if not matches:
+                return Response({"detail": "Mos foydalanuvchi topilmadi."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Q object yordamida shartlarni optional qilish
-        filters = Q(gender=opposite_gender) & Q(birth_year__range=(min_birth_year, max_birth_year))
+            # Limit bitta shartli UPDATE bilan ayiriladi (parallel so'rovlarda ham to'g'ri)
+            if consume_requests(profile.id, 1) is None:
+                transaction.set_rollback(True)
+                return self.limit_exhausted()
+        mark_seen(seen, [m.id for m in matches])
 
-        region_filter = Q(region=profile.region) if profile.region else Q()
-        district_filter = Q(district=profile.district) if profile.district else Q()
+        serializer = MatchedUserSerializer(matches[0])
+        data = {
+            "token": self.user_token(user),
+            "matched_user": serializer.data
+        }
+        if score is not None:
+            data["score"] = score
 
-        # purposes va interests optional
-        purposes_filter = Q()
-        if profile.purposes.exists():
-            purposes_filter = Q(purposes__in=profile.purposes.all())
+        return Response(data, status=status.HTTP_200_OK)
 
-        interests_filter = Q()
-        if profile.interests.exists():
-            interests_filter = Q(interests__in=profile.interests.all())
 
-        # Har bir filter optional OR bilan birlashtiramiz
-        queryset = UserProfile.objects.filter(
-            filters & (region_filter | district_filter | purposes_filter | interests_filter)
-        ).distinct().exclude(id=profile.id)
+class MatchBatchView(MatchUserView):
+    """
+    GET /api/v3/search/byprofile/batch/?count=10
+    Bir so'rovda `count` tagacha turli nomzod; limitdan qaytarilganlar soni bir marta ayriladi.
+    """
+    default_batch_size = 10
+    max_batch_size = 20
 
-        match_user = queryset.order_by("?").first()
-        if not match_user:
-            return Response({"detail": "Mos foydalanuvchi topilmadi."}, status=status.HTTP_404_NOT_FOUND)
+    def get(self, request):
+        user = request.user
+        try:
+            count = int(request.query_params.get("count", self.default_batch_size))
+        except (TypeError, ValueError):
+            return Response({"detail": "count noto'g'ri."}, status=status.HTTP_400_BAD_REQUEST)
+        if count <= 0:
+            return Response({"detail": "count musbat bo'lishi kerak."}, status=status.HTTP_400_BAD_REQUEST)
 
-        extension.requests_left -= 1
-        extension.save()
+        profile, extension, error = self.get_profile(request)
+        if error:
+            return error
 
-        serializer = MatchedUserSerializer(match_user)
-        data = {
-            "token": user.token,
-            "matched_user": serializer.data
-        }
+        count = min(count, self.max_batch_size, remaining_requests(extension))
+        seen = load_seen(profile)
+        blocked = blocked_profile_ids(profile.id)
+        with transaction.atomic():
+            matches = self.collect_matches(profile, build_match_queryset(profile), count, seen, blocked)
+            if not matches:
+                return Response({"detail": "Mos foydalanuvchi topilmadi."}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response(data, status=status.HTTP_200_OK)
+            requests_left = consume_requests(profile.id, len(matches))
+            if requests_left is None:
+                transaction.set_rollback(True)
+                return self.limit_exhausted()
+        mark_seen(seen, [m.id for m in matches])
+
+        return Response({
+            "token": self.user_token(user),
+            "matched_users": MatchedUserSerializer(matches, many=True).data,
+            "requests_left": requests_left,
+        }, status=status.HTTP_200_OK)
 
 class RegionListAPIView(APIView):
     """
@@ -224,35 +347,12 @@ class UserImageAPIView(APIView):
         return Response({"message": "Hech qanday amal bajarilmadi."})
     
 class UpdateUserProfileAPIView(APIView):
+    """PATCH — JWT yoki user_token bilan (JWTOrUserTokenAuthentication)"""
+    authentication_classes = [JWTOrUserTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
-    def get_user_from_request(self, request):
-        """
-        Foydalanuvchini JWT yoki user_token orqali aniqlaydi
-        """
-        auth = JWTAuthentication()
-        try:
-            user, _ = auth.authenticate(request)
-            if user:
-                return user
-        except AuthenticationFailed:
-            pass  
-
-        query_token = request.query_params.get("user_token")
-        token = query_token.strip() if query_token else None
-        if not token:
-            return None
-
-        return CustomUser.objects.filter(token=token).first()
-
     def patch(self, request):
-        user = self.get_user_from_request(request)
-        if not user:
-            return Response(
-                {"detail": "Token xato yoki topilmadi."},
-                status=status.HTTP_401_UNAUTHORIZED
-            )
-
+        user = request.user
         profile, _ = UserProfile.objects.get_or_create(user=user)
         data = request.data
         updated_fields = []
@@ -343,19 +443,11 @@ class UpdateUserProfileAPIView(APIView):
 
 
 class GetUserByTokenAPIView(APIView):
+    authentication_classes = [JWTOrUserTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        token = request.query_params.get('token')
-        if not token:
-            return Response({'error': 'Token is required'}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            user = CustomUser.objects.select_related('profile').get(token=token)
-        except CustomUser.DoesNotExist:
-            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-        serializer = CustomUserSerializer(user)
+        serializer = CustomUserSerializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -366,44 +458,201 @@ class UserProfilePagination(PageNumberPagination):
     max_page_size = 100
 
 class NearbyProfilesAPIView(APIView):
+    """
+    GET /api/v3/search/bylatlong/?lat=..&lon=..&radius=5&limit=30&cursor=..
+    Natijalar eng yaqinidan boshlab, sahifalab qaytadi.
+    """
+    authentication_classes = [ProfileClaimsAuthentication]
     permission_classes = [IsAuthenticated]
+    default_radius_km = 5
+    max_radius_km = 50
+    chunk_size = 2000
+
+    def find_nearby(self, lat, lon, radius_km, limit, after=None):
+        """
+        (masofa, id) bo'yicha after dan keyingi eng yaqin limit ta profil: [(profile_id, masofa_km), ...]
+        Avval xotiradagi indeksdan, bo'lmasa DB orqali (bo'laklab, xotirada faqat limit ta saqlanadi).
+        """
+        if settings.PROFILE_INDEX_ENABLED:
+            try:
+                profile_index.ensure_fresh()
+                ids, distances = profile_index.radius(lat, lon, radius_km, limit=limit, after=after)
+                return list(zip(ids.tolist(), distances.tolist()))
+            except (DatabaseError, ValueError):
+                logger.exception("Spatial indeksda xatolik, DB orqali qidiriladi")
+
+        candidates = nearby_profiles_queryset(UserProfile.objects.all(), lat, lon, radius_km)
+        rows = candidates.values_list('id', 'latitude', 'longitude').iterator(chunk_size=self.chunk_size)
+        ids, distances = nearest_in_rows(rows, lat, lon, radius_km, limit, after, chunk_size=self.chunk_size)
+        return list(zip(ids.tolist(), distances.tolist()))
 
     def get(self, request):
+        params = request.query_params
         try:
-            user_lat = float(request.query_params.get('lat'))
-            user_lon = float(request.query_params.get('lon'))
+            user_lat = float(params.get('lat'))
+            user_lon = float(params.get('lon'))
         except (TypeError, ValueError):
             return Response({'detail': 'Invalid or missing lat/lon parameters.'}, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            radius_km = float(params.get('radius', self.default_radius_km))
+            limit = int(params.get('limit', UserProfilePagination.page_size))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Invalid radius/limit parameters.'}, status=status.HTTP_400_BAD_REQUEST)
+        if radius_km <= 0 or limit <= 0:
+            return Response({'detail': 'radius and limit must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+        radius_km = min(radius_km, self.max_radius_km)
+        limit = min(limit, UserProfilePagination.max_page_size)
+
+        after = None
+        cursor = params.get('cursor')
+        if cursor:
+            try:
+                after_distance, after_id = decode_cursor(cursor)
+                after = (float(after_distance), int(after_id))
+            except (TypeError, ValueError):
+                return Response({'detail': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Bloklangan/bloklagan profillar chiqarib tashlanadi (to'plam keshdan olinadi)
+        blocked = set()
+        if isinstance(request.user, ProfileClaimsUser):
+            profile_id = request.user.profile_summary["pid"]
+        else:
+            profile_id = UserProfile.objects.filter(user=request.user).values_list('id', flat=True).first()
+        if profile_id:
+            blocked = blocked_profile_ids(profile_id)
+
+        # limit + 1 — keyingi sahifa bor-yo'qligini bilish uchun
+        page = self.find_nearby(user_lat, user_lon, radius_km, limit + 1 + len(blocked), after)
+        page = [(pid, distance) for pid, distance in page if pid not in blocked][:limit + 1]
+        has_next = len(page) > limit
+        page = page[:limit]
+
+        profiles = (
+            UserProfile.objects.select_related('user')
+            .prefetch_related(main_image_prefetch())
+            .in_bulk([pid for pid, _ in page])
+        )
         nearby_profiles = []
-        all_profiles = UserProfile.objects.exclude(latitude__isnull=True, longitude__isnull=True)
-
-        for profile in all_profiles:
-            distance = haversine_distance(user_lat, user_lon, profile.latitude, profile.longitude)
-            if distance <= 5:
-                main_image = profile.images.filter(is_main=True).first()
-                image_url = request.build_absolute_uri(main_image.image.url) if main_image else None
-
-                nearby_profiles.append({
-                    'id': profile.id,
-                    'email': profile.user.email,
-                    'name': profile.user.name,
-                    'distance_km': round(distance, 2),
-                    'lat': profile.latitude,
-                    'lon': profile.longitude,
-                    'image': image_url,
-                })
+        for pid, distance in page:
+            profile = profiles.get(pid)
+            if profile is None:
+                continue
+            main_image = get_main_image(profile)
+            image_url = request.build_absolute_uri(main_image.image.url) if main_image else None
+
+            nearby_profiles.append({
+                'id': profile.id,
+                'email': profile.user.email,
+                'name': profile.user.name,
+                'distance_km': round(distance, 2),
+                'lat': profile.latitude,
+                'lon': profile.longitude,
+                'image': image_url,
+            })
+
+        next_cursor = None
+        if has_next:
+            last_id, last_distance = page[-1]
+            next_cursor = encode_cursor([last_distance, last_id])
+        return Response({'nearby_profiles': nearby_profiles, 'next': next_cursor}, status=status.HTTP_200_OK)
+
+class ConnectionListAPIView(APIView):
+    """
+    Connection bo'yicha profil kartalari ro'yxati, eng yangisidan boshlab.
+    ?limit=30&cursor=.. — (created_at, id) bo'yicha keyset sahifalash: COUNT(*) va OFFSET yo'q,
+    so'rov (profil, status, created_at, id) indeksidan o'qiydi. ACCEPTED qatorlarda created_at —
+    obuna bo'lgan vaqt (connections.send_requests).
+    """
+    authentication_classes = [JWTOrUserTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    own_field = None    # joriy foydalanuvchi turgan tomon
+    other_field = None  # kartada ko'rsatiladigan tomon
+    connection_status = None
+
+    def get(self, request):
+        params = request.query_params
+        try:
+            limit = int(params.get('limit', UserProfilePagination.page_size))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Invalid limit parameter.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit <= 0:
+            return Response({'detail': 'limit must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, UserProfilePagination.max_page_size)
+
+        profile = UserProfile.objects.filter(user=request.user).only('id').first()
+        if profile is None:
+            return Response({"detail": "Profil topilmadi."}, status=status.HTTP_404_NOT_FOUND)
+
+        connections = Connection.objects.filter(**{self.own_field: profile.id, 'status': self.connection_status})
+        cursor = params.get('cursor')
+        if cursor:
+            try:
+                after_created, after_id = decode_cursor(cursor)
+                after_created, after_id = datetime.fromisoformat(after_created), int(after_id)
+            except (TypeError, ValueError):
+                return Response({'detail': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+            connections = connections.filter(
+                Q(created_at__lt=after_created) | Q(created_at=after_created, id__lt=after_id)
+            )
+
+        # limit + 1 — keyingi sahifa bor-yo'qligini bilish uchun
+        page = list(
+            connections.order_by('-created_at', '-id')
+            .select_related(f'{self.other_field}__user')
+            .prefetch_related(main_image_prefetch(f'{self.other_field}__'))[:limit + 1]
+        )
+        has_next = len(page) > limit
+        page = page[:limit]
+
+        results = []
+        for item in page:
+            other = getattr(item, self.other_field)
+            main_image = get_main_image(other)
+            results.append({
+                'id': other.id,
+                'name': other.user.name,
+                'birth_year': other.birth_year,
+                'image': request.build_absolute_uri(main_image.image.url) if main_image else None,
+                'since': item.created_at,
+            })
+
+        next_cursor = None
+        if has_next:
+            last = page[-1]
+            next_cursor = encode_cursor([last.created_at.isoformat(), last.id])
+        return Response({'results': results, 'next': next_cursor}, status=status.HTTP_200_OK)
+
+
+class IncomingRequestsAPIView(ConnectionListAPIView):
+    """GET /api/v3/auth/profile/requests/incoming/ — menga yuborilgan zaproslar"""
+    own_field = 'to_profile'
+    other_field = 'from_profile'
+    connection_status = Connection.PENDING
+
+
+class OutgoingRequestsAPIView(ConnectionListAPIView):
+    """GET /api/v3/auth/profile/requests/outgoing/ — men yuborgan, hali javobsiz zaproslar"""
+    own_field = 'from_profile'
+    other_field = 'to_profile'
+    connection_status = Connection.PENDING
+
+
+class ConnectionMatchesAPIView(ConnectionListAPIView):
+    """GET /api/v3/auth/profile/matches/ — o'zaro obuna bo'lganlar"""
+    own_field = 'from_profile'
+    other_field = 'to_profile'
+    connection_status = Connection.ACCEPTED
 
-        return Response({'nearby_profiles': nearby_profiles}, status=status.HTTP_200_OK)
 
 class SomeProtectedAPIView(APIView):
+    authentication_classes = [JWTOrUserTokenAuthentication]
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        token = request.query_params.get('token')
-        if not token:
-            return Response({'error': 'Token is required'}, status=status.HTTP_400_BAD_REQUEST)
-        user = CustomUser.objects.get(token=token)
-        if user.profile.extension.daily_requests_limit > 0:
+        extension = UserProfileExtension.objects.filter(user_profile__user=request.user).first()
+        if extension is None:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        if remaining_requests(extension) > 0:
             return Response({'detail': 'Limit mavjud'},status=status.HTTP_200_OK)
         else:
             return Response({'detail': 'Limit mavjud emas '},status=status.HTTP_403_FORBIDDEN)
@@ -412,59 +661,77 @@ class SomeProtectedAPIView(APIView):
 
 
 class SendRequestAPIView(APIView):
+    authentication_classes = [JWTOrUserTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    throttle_classes = [SendRequestRateThrottle]
+    messages = {
+        ALREADY_CONNECTED: "Siz bu foydalanuvchiga allaqachon obuna bo'lgansiz.",
+        ALREADY_REQUESTED: "Siz bu foydalanuvchiga allaqachon zapros yuborgansiz.",
+        MATCHED: "Siz va bu foydalanuvchi obuna bo'ldingiz.",
+        REQUESTED: "Zapros muvaffaqiyatli yuborildi.",
+    }
+
     def post(self, request):
-        token = request.data.get('token')
         to_profile_id = request.data.get('to_profile_id')
 
-        if not token or not to_profile_id:
-            return Response({"error": "Token va to_profile_id talab qilinadi."}, status=status.HTTP_400_BAD_REQUEST)
-
-        user = get_object_or_404(CustomUser, token=token)
-        from_profile = get_object_or_404(UserProfile, user=user)
-        to_profile = get_object_or_404(UserProfile, id=to_profile_id)
+        if not to_profile_id:
+            return Response({"error": "to_profile_id talab qilinadi."}, status=status.HTTP_400_BAD_REQUEST)
 
-        from_ext, _ = UserProfileExtension.objects.get_or_create(user_profile=from_profile)
-        to_ext, _ = UserProfileExtension.objects.get_or_create(user_profile=to_profile)        
+        try:
+            to_profile_id = int(to_profile_id)
+        except (TypeError, ValueError):
+            return Response({"error": "to_profile_id noto'g'ri."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Agar allaqachon subscriber bo'lsa zapros jo'natish mumkin emas
-        if to_ext.subscribers.filter(id=from_profile.id).exists():
-            return Response({"message": "Siz bu foydalanuvchiga allaqachon obuna bo'lgansiz."}, status=status.HTTP_200_OK)
+        from_profile_id = get_object_or_404(UserProfile.objects.values_list('id', flat=True), user=request.user)
+        if from_profile_id == to_profile_id:
+            return Response({"error": "O'zingizga zapros yuborib bo'lmaydi."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Agar allaqachon zapros yuborilgan bo'lsa
-        if to_ext.requests.filter(id=from_profile.id).exists():
-            return Response({"message": "Siz bu foydalanuvchiga allaqachon zapros yuborgansiz."}, status=status.HTTP_200_OK)
+        try:
+            result = send_request(from_profile_id, to_profile_id)
+        except UserProfile.DoesNotExist:
+            return Response({"error": "Profil topilmadi."}, status=status.HTTP_404_NOT_FOUND)
+        return Response({"message": self.messages[result]}, status=status.HTTP_200_OK)
 
-        # Agar qarshi tomondan ham zapros bo'lsa (ya'ni ikkala tomonda ham zapros bo'lsa)
-        if from_ext.requests.filter(id=to_profile.id).exists():
-            # Zaproslarni o'chirish
-            from_ext.requests.remove(to_profile)
-            to_ext.requests.remove(from_profile)
+class BulkSendRequestAPIView(APIView):
+    """
+    POST /api/v3/auth/profile/send-requests/
+    {"to_profile_ids": [1, 2, 3]} (JWT yoki user_token bilan)
+    Har bir profil uchun natija: requested / already_requested / matched / already_connected / not_found /
+    self (o'z profil id si — yagona zapros endpointidagi 400 ning o'rniga).
+    """
+    authentication_classes = [JWTOrUserTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [SendRequestRateThrottle]
+    max_targets = 50
 
-            # Ikkalasini subscriber ga qo'shish
-            from_ext.subscribers.add(to_profile)
-            to_ext.subscribers.add(from_profile)
+    def post(self, request):
+        to_profile_ids = request.data.get('to_profile_ids')
 
-            # Limitni kamaytirish
-            from_ext.save()
-            to_ext.save()
-            return Response({"message": "Siz va bu foydalanuvchi obuna bo'ldingiz."}, status=status.HTTP_200_OK)
+        if not isinstance(to_profile_ids, list) or not to_profile_ids:
+            return Response({"error": "to_profile_ids (ro'yxat) talab qilinadi."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(to_profile_ids) > self.max_targets:
+            return Response({"error": f"Bir so'rovda ko'pi bilan {self.max_targets} ta profil."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            to_profile_ids = [int(pid) for pid in to_profile_ids]
+        except (TypeError, ValueError):
+            return Response({"error": "to_profile_ids noto'g'ri."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Oddiy zapros yuborish
-        to_ext.requests.add(from_profile)
-        to_ext.save()
-        from_ext.save()
+        from_profile_id = get_object_or_404(UserProfile.objects.values_list('id', flat=True), user=request.user)
+        results = send_requests(from_profile_id, to_profile_ids)
 
-        return Response({"message": "Zapros muvaffaqiyatli yuborildi."}, status=status.HTTP_200_OK)
+        return Response({
+            "results": [
+                {"to_profile_id": pid, "status": results.get(pid, NOT_FOUND)}
+                for pid in dict.fromkeys(to_profile_ids)
+            ]
+        }, status=status.HTTP_200_OK)
 
 class UploadUserImagesAPIView(APIView):
-    def post(self, request):
-        token = request.data.get('token')
-        if not token:
-            return Response({"error": "Token talab qilinadi."}, status=status.HTTP_400_BAD_REQUEST)
+    authentication_classes = [JWTOrUserTokenAuthentication]
+    permission_classes = [IsAuthenticated]
 
-        user = get_object_or_404(CustomUser, token=token)
-        profile = get_object_or_404(UserProfile, user=user)
+    def post(self, request):
+        profile = get_object_or_404(UserProfile, user=request.user)
 
         # Rasm fayllari
         images = request.FILES.getlist('images')
@@ -499,13 +766,11 @@ class UploadUserImagesAPIView(APIView):
 
 
 class ProfileUpdateAPIView(APIView):
-    def post(self, request):
-        token = request.data.get('token')
-        if not token:
-            return Response({"error": "Token talab qilinadi."}, status=status.HTTP_400_BAD_REQUEST)
+    authentication_classes = [JWTOrUserTokenAuthentication]
+    permission_classes = [IsAuthenticated]
 
-        user = get_object_or_404(CustomUser, token=token)
-        profile, created = UserProfile.objects.get_or_create(user=user)
+    def post(self, request):
+        profile, created = UserProfile.objects.get_or_create(user=request.user)
 
         # Oddiy maydonlar
         profile.birth_year = request.data.get('birth_year')
@@ -533,8 +798,8 @@ class ProfileUpdateAPIView(APIView):
         profile.save()
         return Response({"message": "Profil muvaffaqiyatli yangilandi."}, status=status.HTTP_200_OK)
 
-class ResetPasswordAPIView(APIView):
-    def post(self, request):
+class ResetPasswordAPIView(AsyncAPIView):
+    async def post(self, request):
         email_or_phone = request.data.get("email_or_phone")
         new_password = request.data.get("new_password")
 
@@ -543,16 +808,16 @@ class ResetPasswordAPIView(APIView):
 
         try:
             if "@" in email_or_phone:
-                user = CustomUser.objects.get(email=email_or_phone)
+                user = await CustomUser.objects.aget(email=email_or_phone)
             else:
-                user = CustomUser.objects.get(phone=email_or_phone)
+                user = await CustomUser.objects.aget(phone=email_or_phone)
         except CustomUser.DoesNotExist:
             return Response({"error": "Foydalanuvchi topilmadi."}, status=status.HTTP_404_NOT_FOUND)
 
-        user.set_password(new_password)
+        await aset_password(user, new_password)
         user.sms_code = None
         user.sms_code_expires = None
-        user.save()
+        await user.asave()
 
         return Response({"message": "Parol muvaffaqiyatli yangilandi."}, status=status.HTTP_200_OK)
 
@@ -594,6 +859,8 @@ TELEGRAM_USER_ID2 = 6264055381
 
 
 class ForgotPasswordRequestAPIView(APIView):
+    throttle_classes = [OTPRateThrottle, OTPIPRateThrottle]
+
     def post(self, request):
         data = request.data
         email_or_phone = data.get("email_or_phone")
@@ -612,7 +879,7 @@ class ForgotPasswordRequestAPIView(APIView):
                         "is_verified": False
                     }
                 )
-                send_email_code(email_or_phone, pending.code)
+                enqueue_email_code(email_or_phone, pending.code)
                 destination = "email"
             else:
                 user = CustomUser.objects.get(phone=email_or_phone)
@@ -625,7 +892,7 @@ class ForgotPasswordRequestAPIView(APIView):
                     }
                 )
                 message_text = f"Tasdiqlash kodi: {pending.code}"
-                send_telegram_code(message_text)
+                enqueue_telegram_code(message_text)
                 destination = "phone"
 
         except CustomUser.DoesNotExist:
@@ -635,8 +902,10 @@ class ForgotPasswordRequestAPIView(APIView):
 
 
 
-class LoginView(APIView):
-    def post(self, request):
+class LoginView(AsyncAPIView):
+    """Parol tekshiruvi password_pool da — hash hisoblanayotganda worker band bo'lmaydi"""
+
+    async def post(self, request):
         identifier = request.data.get('email') or request.data.get('phone')
         password = request.data.get('password')
 
@@ -644,18 +913,21 @@ class LoginView(APIView):
             return Response({'error': 'Email/Phone and password required'}, status=HTTP_400_BAD_REQUEST)
 
         try:
-            user = CustomUser.objects.get(email=identifier) if '@' in identifier else CustomUser.objects.get(phone=identifier)
+            user = await (CustomUser.objects.aget(email=identifier) if '@' in identifier else CustomUser.objects.aget(phone=identifier))
         except CustomUser.DoesNotExist:
             return Response({'error': 'User not found'}, status=HTTP_404_NOT_FOUND)
 
-        if not user.check_password(password):
+        if not await acheck_password(user, password):
             return Response({'error': 'Incorrect password'}, status=HTTP_401_UNAUTHORIZED)
 
         if not user.is_active:
             return Response({'error': 'User is inactive'}, status=HTTP_403_FORBIDDEN)
 
+        return await sync_to_async(self.login_response)(user)
+
+    def login_response(self, user):
         # JWT tokenlar
-        refresh = RefreshToken.for_user(user)
+        refresh = add_profile_claims(RefreshToken.for_user(user), user)
         access_token = str(refresh.access_token)
 
         # User profile ma'lumotlari
@@ -690,8 +962,8 @@ def send_sms_code(phone):
     return code
 
 
-class RequestSMSCodeView(APIView):
-    def post(self, request):
+class RequestSMSCodeView(AsyncAPIView):
+    async def post(self, request):
         data = request.data
 
         name = data.get('name')
@@ -705,10 +977,10 @@ class RequestSMSCodeView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        if CustomUser.objects.filter(email=email).exists():
+        if await CustomUser.objects.filter(email=email).aexists():
             return Response({'error': 'Email already exists'}, status=400)
 
-        if CustomUser.objects.filter(phone=phone).exists():
+        if await CustomUser.objects.filter(phone=phone).aexists():
             return Response({'error': 'Phone already exists'}, status=400)
 
         code = send_sms_code(phone)
@@ -724,8 +996,8 @@ class RequestSMSCodeView(APIView):
                 token=secrets.token_hex(16),
                 is_active=False  
             )
-            user.set_password(password)
-            user.save()
+            await aset_password(user, password)
+            await user.asave()
 
             return Response({'message': 'SMS code sent'}, status=200)
 